@@ -0,0 +1,331 @@
+"""Benchmarks for ForaGym-v0 and ForaGym-v1.
+
+Measures import time, construction time and model memory, reset latency,
+steps per second of single and batched environments, and solve time of the
+finite horizon planner over several environment sizes. Results are written as
+JSON so runs can be compared between commits:
+
+    python benchmarks/run.py --output bench.json
+    python benchmarks/run.py --quick
+
+`--check-imports` only checks that importing the package, or one of the
+environments, does not load the modules listed in `IMPORT_CHECKS`, and exits
+with status 1 if it does.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import gymnasium
+import numpy as np
+
+# run from a checkout: import the foragym package next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import foragym  # registers the ForaGym ids
+from foragym.envs import transition_model
+from foragym.planning import solve
+from foragym.vector import ForaGymThreatVector
+
+ENV_IDS = ["foragym/ForaGym-v0", "foragym/ForaGym-v1"]
+POLICIES = ["wait", "forage", "random"]
+
+# (num_days, num_life_points, num_forests) for v1, with the default forests tiled
+THREAT_SIZES = [(9, 7, 72), (30, 30, 72), (100, 50, 720)]
+# (num_days_left, num_life_points, num_fields) for v0
+SIMPLE_SIZES = [(6, 5, 5), (30, 30, 5), (100, 50, 8)]
+
+# modules that each import statement must not load
+IMPORT_CHECKS = {
+    "import foragym": [
+        "pandas",
+        "gym",
+        "foragym.envs.foragym_simple",
+        "foragym.envs.foragym_with_threat",
+    ],
+    "from foragym.envs import ForaGym_with_threat": [
+        "pandas",
+        "gym",
+        "foragym.envs.foragym_simple",
+    ],
+    "from foragym.envs import ForaGym": [
+        "pandas",
+        "foragym.envs.foragym_with_threat",
+    ],
+}
+
+
+def _make_env(env_id, **kwargs):
+    """Construct the env class registered under `env_id`, without wrappers."""
+    spec = gymnasium.spec(env_id)
+    env_creator = gymnasium.envs.registration.load_env_creator(spec.entry_point)
+
+    return env_creator(**kwargs)
+
+
+def _is_legacy(env):
+    return not isinstance(env, gymnasium.Env)
+
+
+def _timeit(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    return {"min_s": min(timings), "median_s": float(np.median(timings))}
+
+
+def bench_import(statement, repeat):
+    """Time `statement` in fresh interpreters and list the forbidden modules
+    it loads."""
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "print(json.dumps([time.perf_counter() - start, sorted(sys.modules)]))\n"
+    )
+    # the child interpreter must import the same foragym package
+    root = os.path.dirname(os.path.dirname(os.path.abspath(foragym.__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            env=env,
+        ).stdout
+        elapsed, modules = json.loads(output.splitlines()[-1])
+        timings.append(elapsed)
+
+    return {
+        "benchmark": "import",
+        "statement": statement,
+        "min_s": min(timings),
+        "median_s": float(np.median(timings)),
+        "unexpected_modules": [
+            name for name in IMPORT_CHECKS[statement] if name in modules
+        ],
+    }
+
+
+def check_imports(repeat=1):
+    """Run `bench_import` for every statement of `IMPORT_CHECKS`.
+
+    Returns the results and whether no statement loaded a forbidden module.
+    """
+    results = [bench_import(statement, repeat) for statement in IMPORT_CHECKS]
+
+    return results, not any(result["unexpected_modules"] for result in results)
+
+
+def bench_construct(env_id, repeat):
+    # build from scratch: no shared model and, for v1, no on-disk cache
+    kwargs = {"cache": False} if env_id.endswith("v1") else {}
+
+    def cold():
+        transition_model._shared_models.clear()
+        return _make_env(env_id, **kwargs)
+
+    tracemalloc.start()
+    env = cold()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "benchmark": "construct",
+        "env_id": env_id,
+        "model_bytes": int(env.unwrapped.model.nbytes),
+        "peak_bytes": int(peak_bytes),
+        "cold": _timeit(cold, repeat),
+        "shared": _timeit(lambda: _make_env(env_id), repeat),
+    }
+
+    try:
+        result["gym_make"] = _timeit(lambda: gymnasium.make(env_id), repeat)
+    except TypeError as e:
+        # legacy gym envs are rejected by recent gymnasium releases
+        result["gym_make"] = {"error": str(e)}
+
+    return result
+
+
+def bench_reset(env_id, repeat):
+    env = _make_env(env_id)
+    env.reset(seed=0)
+
+    num_resets = 1000
+    timing = _timeit(lambda: [env.reset() for _ in range(num_resets)], repeat)
+
+    return {
+        "benchmark": "reset",
+        "env_id": env_id,
+        "latency_us": timing["min_s"] / num_resets * 1e6,
+    }
+
+
+def _get_actions(policy, num_steps, num_envs=None, seed=0):
+    shape = num_steps if num_envs is None else (num_steps, num_envs)
+    if policy == "random":
+        return np.random.default_rng(seed).integers(0, 2, size=shape)
+
+    return np.full(shape, POLICIES.index(policy), dtype=np.int64)
+
+
+def bench_step(env_id, policy, num_steps):
+    env = _make_env(env_id)
+    legacy = _is_legacy(env)
+    actions = _get_actions(policy, num_steps).tolist()
+
+    env.reset(seed=0)
+    start = time.perf_counter()
+    for action in actions:
+        if legacy:
+            _, _, done, _ = env.step(action)
+        else:
+            _, _, done, _, _ = env.step(action)
+        if done:
+            env.reset()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "benchmark": "step",
+        "env_id": env_id,
+        "policy": policy,
+        "num_envs": 1,
+        "steps_per_s": num_steps / elapsed,
+    }
+
+
+def bench_vector_step(policy, num_envs, num_steps):
+    envs = ForaGymThreatVector(num_envs=num_envs)
+    actions = _get_actions(policy, num_steps, num_envs)
+
+    envs.reset(seed=0)
+    start = time.perf_counter()
+    for step_actions in actions:
+        envs.step(step_actions)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "benchmark": "vector_step",
+        "env_id": "foragym/ForaGym-v1",
+        "policy": policy,
+        "num_envs": num_envs,
+        "steps_per_s": num_steps * num_envs / elapsed,
+    }
+
+
+def bench_solve(env_id, size, repeat):
+    if env_id.endswith("v1"):
+        num_days, num_life_points, num_forests = size
+        forests = _make_env(env_id).forest_params
+        forests = np.resize(forests, (num_forests, forests.shape[1]))
+        kwargs = dict(
+            forests=forests,
+            num_days=num_days,
+            num_life_points=num_life_points,
+            cache=False,
+        )
+    else:
+        num_days, num_life_points, num_fields = size
+        kwargs = dict(
+            num_days_left=num_days,
+            num_life_points=num_life_points,
+            num_fields=num_fields,
+        )
+
+    env = _make_env(env_id, **kwargs)
+
+    return {
+        "benchmark": "solve",
+        "env_id": env_id,
+        "size": list(size),
+        "nS": int(env.unwrapped.model.nS),
+        "num_entries": int(len(env.unwrapped.model.prob)),
+        **_timeit(lambda: solve(env), repeat),
+    }
+
+
+def get_metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "gymnasium": gymnasium.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+
+def run(quick=False, num_envs=1024):
+    repeat = 3 if quick else 10
+    num_steps = 10_000 if quick else 100_000
+    num_vector_steps = 100 if quick else 1000
+
+    results, _ = check_imports(repeat)
+    for env_id in ENV_IDS:
+        results.append(bench_construct(env_id, repeat))
+        results.append(bench_reset(env_id, repeat))
+        for policy in POLICIES:
+            results.append(bench_step(env_id, policy, num_steps))
+
+    for policy in POLICIES:
+        results.append(bench_vector_step(policy, num_envs, num_vector_steps))
+
+    for env_id, sizes in zip(ENV_IDS, [SIMPLE_SIZES, THREAT_SIZES]):
+        for size in sizes[:2] if quick else sizes:
+            results.append(bench_solve(env_id, size, repeat))
+
+    return {"metadata": get_metadata(), "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--quick", action="store_true", help="fewer steps and sizes")
+    parser.add_argument("--num-envs", type=int, default=1024)
+    parser.add_argument(
+        "--check-imports",
+        action="store_true",
+        help="only check that imports stay lightweight; exit 1 on a regression",
+    )
+    args = parser.parse_args(argv)
+
+    if args.check_imports:
+        results, passed = check_imports()
+        print(json.dumps(results, indent=2))
+        if not passed:
+            sys.exit(1)
+        return
+
+    report = json.dumps(run(quick=args.quick, num_envs=args.num_envs), indent=2)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
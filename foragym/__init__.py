@@ -2,12 +2,12 @@ from gymnasium.envs.registration import register
 
 register(
     id='foragym/ForaGym-v0',
-    entry_point='foragym.envs:ForaGym',
+    entry_point='foragym.envs.foragym_simple:ForaGym',
     max_episode_steps=300
 )
 
 register(
     id='foragym/ForaGym-v1',
-    entry_point='foragym.envs:ForaGym_with_threat',
+    entry_point='foragym.envs.foragym_with_threat:ForaGym_with_threat',
     max_episode_steps=300
 )
\ No newline at end of file
@@ -0,0 +1,158 @@
+import numpy as np
+
+from foragym.planning import solve
+
+ALGORITHMS = ("q_learning", "sarsa", "expected_sarsa")
+
+
+def _get_entry_cum_probs(model):
+    """Cumulative probability of every transition entry within its row."""
+    cum_probs = np.cumsum(model.prob)
+    row_starts = np.repeat(model.indptr[:-1], np.diff(model.indptr))
+    cum_probs -= np.concatenate([[0.0], cum_probs])[row_starts]
+    cum_probs.setflags(write=False)
+
+    return cum_probs
+
+
+def _sample_entries(model, rows, cum_probs, max_length, chance):
+    start = model.indptr[rows]
+    length = model.indptr[rows + 1] - start
+    offsets = np.arange(max_length)
+
+    # the last entry of a row takes whatever probability rounding leaves
+    index = np.minimum(start[:, None] + offsets, len(cum_probs) - 1)
+    is_passed = (offsets < length[:, None] - 1) & (cum_probs[index] <= chance[:, None])
+
+    return start + is_passed.sum(axis=1)
+
+
+def _sample_states(initial_cdf, num_states, rng):
+    states = np.searchsorted(initial_cdf, rng.random(num_states), side="right")
+    return np.minimum(states, len(initial_cdf) - 1)
+
+
+def _get_action_probs(Q, epsilon):
+    """Epsilon-greedy action probabilities, splitting ties evenly."""
+    is_best = Q == Q.max(axis=1, keepdims=True)
+    greedy = is_best / is_best.sum(axis=1, keepdims=True)
+
+    return epsilon / Q.shape[1] + (1 - epsilon) * greedy
+
+
+def _sample_actions(probs, rng):
+    chance = rng.random(len(probs))
+    return (probs.cumsum(axis=1)[:, :-1] <= chance[:, None]).sum(axis=1)
+
+
+def train(
+    env,
+    algorithm="q_learning",
+    num_steps=2000,
+    num_envs=1024,
+    learning_rate=None,
+    epsilon=0.1,
+    eval_interval=100,
+    seed=None,
+):
+    """Learn the Q-values of a ForaGym environment with a tabular method.
+
+    `algorithm` is one of `ALGORITHMS`, with epsilon-greedy behaviour. Each
+    step advances `num_envs` episodes at once, sampled from `env.model` over
+    encoded states, and updates every visited (state, action) pair with the
+    mean TD error of its samples in the batch. With `learning_rate=None` the
+    step size of a pair is the fraction of its visits made in this batch,
+    i.e. a running average of its targets.
+
+    Returns `Q`, shaped like the `Q` of `planning.solve`, and a history of
+    the convergence to the exact `Q`, every `eval_interval` steps: the max
+    and mean absolute error over visited (state, action) pairs, and the
+    fraction of visited states whose greedy action is optimal.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"algorithm must be one of {ALGORITHMS}, got {algorithm!r}")
+
+    env = env.unwrapped
+    model = env.model
+    num_pairs = model.nS * model.nA
+
+    _, Q_opt, policy_opt = solve(env)
+    Q_opt = Q_opt.reshape(model.nS, model.nA)
+    policy_opt = policy_opt.reshape(model.nS, model.nA + 1)
+
+    cum_probs = model.derived("entry_cum_probs", _get_entry_cum_probs)
+    max_length = int(np.diff(model.indptr).max())
+    initial_cdf = np.cumsum(env.get_initial_distribution())
+    rng = np.random.default_rng(seed)
+
+    Q = np.zeros((model.nS, model.nA))
+    Q_flat = Q.reshape(-1)
+    visits = np.zeros(num_pairs, dtype=np.int64)
+    history = {"step": [], "max_error": [], "mean_error": [], "policy_agreement": []}
+
+    states = _sample_states(initial_cdf, num_envs, rng)
+    actions = _sample_actions(_get_action_probs(Q[states], epsilon), rng)
+
+    for step in range(1, num_steps + 1):
+        rows = states * model.nA + actions
+        entries = _sample_entries(
+            model, rows, cum_probs, max_length, rng.random(num_envs)
+        )
+        rewards = model.reward[entries]
+        next_states = model.next_state[entries].astype(np.int64)
+        dones = model.done[entries] | ~model.active[next_states]
+
+        # finished episodes continue from a new initial state
+        num_dones = int(np.count_nonzero(dones))
+        if num_dones:
+            next_states[dones] = _sample_states(initial_cdf, num_dones, rng)
+
+        next_Q = Q[next_states]
+        next_probs = _get_action_probs(next_Q, epsilon)
+        next_actions = _sample_actions(next_probs, rng)
+
+        if algorithm == "q_learning":
+            next_values = next_Q.max(axis=1)
+        elif algorithm == "sarsa":
+            next_values = next_Q[np.arange(num_envs), next_actions]
+        else:
+            next_values = (next_probs * next_Q).sum(axis=1)
+
+        td_errors = rewards + np.where(dones, 0.0, next_values) - Q_flat[rows]
+
+        counts = np.bincount(rows, minlength=num_pairs)
+        visits += counts
+        updated = np.flatnonzero(counts)
+        mean_td_errors = (
+            np.bincount(rows, weights=td_errors, minlength=num_pairs)[updated]
+            / counts[updated]
+        )
+        if learning_rate is None:
+            rates = counts[updated] / visits[updated]
+        else:
+            rates = learning_rate
+        Q_flat[updated] += rates * mean_td_errors
+
+        states = next_states
+        actions = next_actions
+
+        if step % eval_interval == 0 or step == num_steps:
+            is_visited = visits > 0
+            errors = np.abs(Q_flat - Q_opt.reshape(-1))[is_visited]
+
+            visited_states = np.flatnonzero(
+                is_visited.reshape(model.nS, model.nA).any(axis=1) & model.active
+            )
+            greedy = Q[visited_states].argmax(axis=1)
+            agrees = (policy_opt[visited_states, greedy] == 1) | (
+                policy_opt[visited_states, model.nA] == 1
+            )
+
+            history["step"].append(step)
+            history["max_error"].append(errors.max())
+            history["mean_error"].append(errors.mean())
+            history["policy_agreement"].append(agrees.mean())
+
+    history = {name: np.array(values) for name, values in history.items()}
+
+    return Q.reshape(model.state_shape + (model.nA,)), history
@@ -1,2 +1,21 @@
-from foragym.envs.foragym_simple import ForaGym
-from foragym.envs.foragym_with_threat import ForaGym_with_threat
\ No newline at end of file
+import importlib
+
+# environment classes are imported on first use, so that one environment can
+# be used without importing the dependencies of the other (e.g. legacy gym)
+_ENV_MODULES = {
+    "ForaGym": "foragym.envs.foragym_simple",
+    "ForaGym_with_threat": "foragym.envs.foragym_with_threat",
+}
+
+__all__ = list(_ENV_MODULES)
+
+
+def __getattr__(name):
+    if name in _ENV_MODULES:
+        return getattr(importlib.import_module(_ENV_MODULES[name]), name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
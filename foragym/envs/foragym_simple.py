@@ -1,9 +1,36 @@
 # import important libraries and modules
 import gym
+import random
+import time
 import numpy as np
 
-from itertools import product
 from gym import spaces
+from math import comb
+
+from foragym.envs.text_sink import TextSink
+from foragym.envs.transition_model import TransitionModel, get_shared_model
+
+# number of uniforms drawn from `np_random` at a time
+CHANCE_BLOCK_SIZE = 1024
+
+# "full" and "minimal": chance and prob_transition of every step; "none": empty
+INFO_LEVELS = ("full", "minimal", "none")
+
+# text of "ansi" and "human" rendering, formatted once per render
+RENDER_TEMPLATE = "--Days left: {}\n--State of Field: [{}]\n--Current life: {}\n--Type of Weather: {}\n"
+
+
+def get_failure_prob(model):
+    """Probability that foraging fails, per state."""
+    # forage failures use the same slots as wait
+    num_failures = int(model.valid[0].sum())
+    states = np.flatnonzero(model.active)
+
+    failure_prob = np.zeros(model.nS)
+    failure_prob[states] = model.prob[model.entries(states, 1)[:, :num_failures]].sum(axis=1)
+    failure_prob.setflags(write=False)
+
+    return failure_prob
 
 
 class ForaGym(gym.Env):
@@ -15,30 +42,69 @@ class ForaGym(gym.Env):
     ### Reward
     ### Arguments
     """
-    metadata = {"render_modes": ["human", "text"]}
+    metadata = {"render_modes": ["human", "text", "ansi"]}
+
+    def __init__(
+        self,
+        render_mode=None,
+        num_days_left=6,
+        num_life_points=5,
+        num_fields=5,
+        flat_obs=False,
+        info_level="full",
+        render_every=1,
+        render_fraction=1.0,
+        render_sink=None,
+    ):
+        if info_level not in INFO_LEVELS:
+            raise ValueError(f"info_level must be one of {INFO_LEVELS}, got {info_level!r}")
 
-    def __init__(self, render_mode=None):
         self.render_mode = render_mode
+        # human rendering only shows every `render_every`th episode, each kept
+        # with probability `render_fraction`, through `render_sink`,
+        # a buffered `TextSink` by default
+        self.render_every = render_every
+        self.render_fraction = render_fraction
+        self.render_sink = render_sink
+        self._render_rng = random.Random()
+        self._num_episodes = 0
+        self._is_rendered = True
+        self.flat_obs = flat_obs
+        self.info_level = info_level
 
         self.ACTION_DICT = {0: "Wait", 1: "Forage"}
         self.WEATHER_DICT = {0: "Clear", 1: "Rainy"}
 
-        self.NUM_DAYS_LEFT = 6
-        self.NUM_LIFE_POINTS = 5
-        self.NUM_FIELDS = 5
+        self.NUM_DAYS_LEFT = num_days_left
+        self.NUM_LIFE_POINTS = num_life_points
+        self.NUM_FIELDS = num_fields
         self.NUM_WEATHER_TYPES = 2
         self.BAD_WEATHER_EFFECT = 0.1
         self.NUM_ACTIONS = len(self.ACTION_DICT)
 
         self.action_space = spaces.Discrete(self.NUM_ACTIONS)
-        self.observation_space = spaces.Dict(
-            {
-                "days_left": spaces.Discrete(self.NUM_DAYS_LEFT),
-                "life_points": spaces.Discrete(self.NUM_LIFE_POINTS),
-                "field_state": spaces.MultiBinary(self.NUM_FIELDS),
-                "weather_type": spaces.Discrete(self.NUM_WEATHER_TYPES)
-            }
-        )
+        if self.flat_obs:
+            # days_left, life_points, field_state, weather_type
+            self.observation_space = spaces.Box(
+                low=0,
+                high=np.array(
+                    [self.NUM_DAYS_LEFT - 1, self.NUM_LIFE_POINTS - 1]
+                    + [1] * self.NUM_FIELDS
+                    + [self.NUM_WEATHER_TYPES - 1],
+                    dtype=np.float32,
+                ),
+                dtype=np.float32,
+            )
+            self._obs = np.zeros(self.NUM_FIELDS + 3, dtype=np.float32)
+        else:
+            self.observation_space = spaces.Dict(
+                {
+                    "days_left": spaces.Discrete(self.NUM_DAYS_LEFT),
+                    "life_points": spaces.Discrete(self.NUM_LIFE_POINTS),
+                    "field_state": spaces.MultiBinary(self.NUM_FIELDS),
+                    "weather_type": spaces.Discrete(self.NUM_WEATHER_TYPES)
+                }
+            )
 
         self.NUM_STATES = (
             self.NUM_DAYS_LEFT * self.NUM_LIFE_POINTS * (self.NUM_FIELDS + 1) * self.NUM_WEATHER_TYPES
@@ -46,103 +112,187 @@ class ForaGym(gym.Env):
 
         self.NUM_INTERNAL_STATES = self.NUM_FIELDS * self.NUM_WEATHER_TYPES
 
+        self.FIELD_BITS = np.arange(self.NUM_FIELDS)
+
         self.is_dead = False
-        
-        self.P = {
-            state: {action: [] for action in range(self.NUM_ACTIONS)}
-            for state in range(self.NUM_STATES)
-        }
 
+        self._chances = []
+        self._chance_index = 0
+        # state of `np_random` before drawing `_chances`, kept for snapshots
+        self._chance_state = None
         self._get_new_day(with_life_points=True)
 
-        self._get_transition_probs()
+        # near zero for a shared model, longer when built
+        start = time.perf_counter()
+        self.model = get_shared_model(
+            (
+                type(self).__name__,
+                self.NUM_DAYS_LEFT,
+                self.NUM_LIFE_POINTS,
+                self.NUM_FIELDS,
+                self.NUM_WEATHER_TYPES,
+                self.BAD_WEATHER_EFFECT,
+            ),
+            self._get_transition_probs,
+        )
+        self.model_load_time = time.perf_counter() - start
+        self.P = self.model.P
+        self.failure_prob = self.model.derived("failure_prob", get_failure_prob)
 
     def _get_new_day(self, with_days_left=False, with_life_points=True):
         if with_days_left:
-            self.days_left = 5
-
+            self.days_left = self.NUM_DAYS_LEFT - 1
 
         if with_life_points:
-            self.life_points = 0
-            while not self.life_points:
-                self.life_points = self.observation_space["life_points"].sample()
-
-        field_state_sum = 0
-        while not field_state_sum:
-            self.field_state = self.observation_space["field_state"].sample()
-            field_state_sum = sum(self.field_state)
-
-        self.weather_type = self.observation_space["weather_type"].sample()
-
+            self.life_points = 1 + int((self.NUM_LIFE_POINTS - 1) * self._get_chance())
+
+        # uniform over the nonzero field masks
+        field_mask = 1 + int((2 ** self.NUM_FIELDS - 1) * self._get_chance())
+        self.field_state = ((field_mask >> self.FIELD_BITS) & 1).astype(np.int8)
+        # handed out in observations, so never modified in place
+        self.field_state.setflags(write=False)
+        self.field_count = bin(field_mask).count("1")
+
+        self.weather_type = int(self.NUM_WEATHER_TYPES * self._get_chance())
+
+    def get_initial_distribution(self):
+        """Probability of each encoded state at the start of an episode.
+
+        Field counts follow the field masks `reset` draws, not the uniform
+        counts that `P` moves to.
+        """
+        # number of nonzero field masks with each field count
+        field_counts = np.array([comb(self.NUM_FIELDS, n) for n in range(self.NUM_FIELDS + 1)])
+        field_counts[0] = 0
+
+        dist = np.zeros((self.NUM_DAYS_LEFT, self.NUM_LIFE_POINTS, self.NUM_FIELDS + 1, self.NUM_WEATHER_TYPES))
+        dist[-1, 1:] = field_counts[:, None]
+
+        return (dist / dist.sum()).ravel()
+
+    def _get_chance(self):
+        """Next uniform of the episode stream, drawn from `np_random` in blocks."""
+        if self._chance_index == len(self._chances):
+            self._chance_state = self.np_random.bit_generator.state
+            self._chances = self.np_random.random(CHANCE_BLOCK_SIZE).tolist()
+            self._chance_index = 0
+
+        chance = self._chances[self._chance_index]
+        self._chance_index += 1
+
+        return chance
+
+    def get_state(self):
+        """Snapshot of the episode, to be restored with `set_state`.
+
+        A flat tuple of the episode variables (days_left, life_points,
+        field_state, field_count, weather_type, is_dead), the index in the
+        chance block and the state of `np_random` the block was drawn from, so
+        the block itself is redrawn rather than stored. field_state is never
+        modified, so it is shared rather than copied.
+        """
+        if self._chance_index:
+            rng_state = self._chance_state
+        else:
+            rng_state = self.np_random.bit_generator.state
+
+        return (
+            self.days_left,
+            self.life_points,
+            self.field_state,
+            self.field_count,
+            self.weather_type,
+            self.is_dead,
+            self._chance_index,
+            rng_state,
+        )
 
+    def set_state(self, state):
+        """Restore a snapshot of `get_state`, possibly taken from another env with the same parameters."""
+        (
+            self.days_left,
+            self.life_points,
+            self.field_state,
+            self.field_count,
+            self.weather_type,
+            self.is_dead,
+            chance_index,
+            rng_state,
+        ) = state
+
+        # the current block is kept when the snapshot was taken from it
+        if not chance_index or rng_state is not self._chance_state:
+            self.np_random.bit_generator.state = rng_state
+            self._chances = []
+            self._chance_index = 0
+            if chance_index:
+                self._get_chance()
+        self._chance_index = chance_index
 
     def _get_transition_probs(self):
-        for days_left in range(1, self.NUM_DAYS_LEFT):
-            for life_point in range(1, self.NUM_LIFE_POINTS):
-                for field in range(1, self.NUM_FIELDS + 1):
-                    for weather in range(self.NUM_WEATHER_TYPES):
-                        prob_success = np.clip(field / self.NUM_FIELDS - weather*self.BAD_WEATHER_EFFECT, 0, 1)
-                        prob_failure = np.clip(1 - prob_success, 0, 1)
-
-                        enc_state = self.encode(days_left, life_point, field, weather)
-
-                        for action in range(self.NUM_ACTIONS):
-                            if action:
-                                # forage but fail
-                                new_days_left_failure = np.clip(days_left - 1, 0, self.NUM_DAYS_LEFT - 1)
-                                new_life_point_failure = np.clip(life_point - 2, 0, self.NUM_LIFE_POINTS - 1)
-                                new_field_failure = list(range(1, self.NUM_FIELDS + 1))
-                                new_weather_failure = list(range(self.NUM_WEATHER_TYPES))
-                                new_states = list(product([new_days_left_failure], [new_life_point_failure], new_field_failure, new_weather_failure))
-                                for new_days_left, new_life_point, new_field, new_weather in new_states:
-                                    new_enc_state = self.encode(new_days_left, new_life_point, new_field, new_weather)
-                                    if not new_life_point:
-                                        self.P[enc_state][action].append([prob_failure / len(new_states), new_enc_state, -1, True])
-                                    elif not new_days_left:
-                                        self.P[enc_state][action].append([prob_failure / len(new_states), new_enc_state, 0, True])
-                                    else:
-                                        self.P[enc_state][action].append([prob_failure / len(new_states), new_enc_state, 0, False])
-                                # forage and found
-                                new_days_left_success = np.clip(days_left - 1, 0, self.NUM_DAYS_LEFT - 1)
-                                new_life_point_success = np.clip(life_point + 1, 0, self.NUM_LIFE_POINTS - 1)
-                                new_field_success = list(range(1, self.NUM_FIELDS + 1))
-                                new_weather_success = list(range(self.NUM_WEATHER_TYPES))
-                                new_states = list(product([new_days_left_success], [new_life_point_success], new_field_success, new_weather_success))
-                                for new_days_left, new_life_point, new_field, new_weather in new_states:
-                                    new_enc_state = self.encode(new_days_left, new_life_point, new_field, new_weather)
-                                    if not new_life_point:
-                                        self.P[enc_state][action].append([prob_success / len(new_states), new_enc_state, -1, True])
-                                    elif not new_days_left:
-                                        self.P[enc_state][action].append([prob_success / len(new_states), new_enc_state, 0, True])
-                                    else:
-                                        self.P[enc_state][action].append([prob_success / len(new_states), new_enc_state, 0, False])
-                            else:
-                                # wait
-                                new_days_left_wait = np.clip(days_left - 1, 0, self.NUM_DAYS_LEFT - 1)
-                                new_life_point_wait = np.clip(life_point - 1, 0, self.NUM_LIFE_POINTS - 1)
-                                new_field_wait = list(range(1, self.NUM_FIELDS + 1))
-                                new_weather_wait = list(range(self.NUM_WEATHER_TYPES))
-                                new_states = list(product([new_days_left_wait], [new_life_point_wait], new_field_wait, new_weather_wait))
-                                for new_days_left, new_life_point, new_field, new_weather in new_states:
-                                    new_enc_state = self.encode(new_days_left, new_life_point, new_field, new_weather)
-                                    if not new_life_point:
-                                        self.P[enc_state][action].append([1.0 / len(new_states), new_enc_state, -1, True])
-                                    elif not new_days_left:
-                                        self.P[enc_state][action].append([1.0 / len(new_states), new_enc_state, 0, True])
-                                    else:
-                                        self.P[enc_state][action].append([1.0 / len(new_states), new_enc_state, 0, False])
+        days_left, life_point, field, weather = self.decode(np.arange(self.NUM_STATES))
+        active = (days_left > 0) & (life_point > 0) & (field > 0)
+        days_left = days_left[active]
+        life_point = life_point[active]
+        field = field[active]
+        weather = weather[active]
+
+        prob_success = np.clip(field / self.NUM_FIELDS - weather * self.BAD_WEATHER_EFFECT, 0, 1)
+        prob_failure = np.clip(1 - prob_success, 0, 1)
+
+        # slot k leads to the k % NUM_INTERNAL_STATES-th (field, weather) pair of
+        # the next day; the second half of the slots is used only by forage success
+        new_field = np.tile(
+            np.repeat(np.arange(1, self.NUM_FIELDS + 1), self.NUM_WEATHER_TYPES), 2
+        )
+        new_weather = np.tile(np.arange(self.NUM_WEATHER_TYPES), 2 * self.NUM_FIELDS)
+        is_success = np.arange(2 * self.NUM_INTERNAL_STATES) >= self.NUM_INTERNAL_STATES
+
+        # wait, forage but fail, forage and found
+        life_point_change = np.stack([np.where(is_success, 0, -1), np.where(is_success, 1, -2)])
+        valid = np.stack([~is_success, np.ones_like(is_success)])
+        actions, slots = np.nonzero(valid)
+
+        prob = np.where(
+            actions == 0,
+            1.0,
+            np.where(is_success[slots], prob_success[:, None], prob_failure[:, None]),
+        ) / self.NUM_INTERNAL_STATES
+
+        new_days_left = np.clip(days_left - 1, 0, self.NUM_DAYS_LEFT - 1)[:, None]
+        new_life_point = np.clip(
+            life_point[:, None] + life_point_change[actions, slots], 0, self.NUM_LIFE_POINTS - 1
+        )
+        new_enc_state = self.encode(
+            new_days_left, new_life_point, new_field[slots], new_weather[slots]
+        )
+
+        return TransitionModel.from_active(
+            active=active,
+            valid=valid,
+            prob=prob,
+            next_state=new_enc_state,
+            reward=np.where(new_life_point == 0, -1.0, 0.0),
+            done=(new_life_point == 0) | (new_days_left == 0),
+            state_shape=(
+                self.NUM_DAYS_LEFT,
+                self.NUM_LIFE_POINTS,
+                self.NUM_FIELDS + 1,
+                self.NUM_WEATHER_TYPES,
+            ),
+        )
 
     def encode(self, days_left, life_point, field, weather):
         enc_state = days_left
 
-        enc_state *= self.NUM_LIFE_POINTS
-        enc_state += life_point
+        enc_state = enc_state * self.NUM_LIFE_POINTS
+        enc_state = enc_state + life_point
 
-        enc_state *= (self.NUM_FIELDS + 1)
-        enc_state += field
+        enc_state = enc_state * (self.NUM_FIELDS + 1)
+        enc_state = enc_state + field
 
-        enc_state *= self.NUM_WEATHER_TYPES
-        enc_state += weather
+        enc_state = enc_state * self.NUM_WEATHER_TYPES
+        enc_state = enc_state + weather
 
         return enc_state
 
@@ -162,6 +312,15 @@ class ForaGym(gym.Env):
         return list(reversed(out))
 
     def _get_obs(self):
+        if self.flat_obs:
+            # written in place: the same array is returned at every step
+            obs = self._obs
+            obs[0] = self.days_left
+            obs[1] = self.life_points
+            obs[2:-1] = self.field_state
+            obs[-1] = self.weather_type
+            return obs
+
         return {
             "days_left": self.days_left,
             "life_points": self.life_points,
@@ -170,36 +329,78 @@ class ForaGym(gym.Env):
         }
 
     def step(self, action):
+        if self.days_left <= 0 or self.life_points <= 0:
+            raise RuntimeError("the episode is over, call reset")
+
+        action = int(action)
         self._get_new_day(with_life_points=False)
 
-        enc_state = self.encode(self.days_left, self.life_points, sum(self.field_state), self.weather_type)
-        P = self.P[enc_state][action]
-        
+        enc_state = self.encode(self.days_left, self.life_points, self.field_count, self.weather_type)
+
         if action:
-            chance = np.random.sample()
-            
-            if chance >= P[0][0]*(self.NUM_INTERNAL_STATES):
-                prob_transition, new_state, reward, self.is_dead = P[self.NUM_INTERNAL_STATES]
+            chance = self._get_chance()
+
+            if chance >= self.failure_prob[enc_state]:
+                slot = self.NUM_INTERNAL_STATES
             else:
-                prob_transition, new_state, reward, self.is_dead = P[0]
+                slot = 0
         else:
             chance = 0
-            prob_transition, new_state, reward, self.is_dead = P[0]
+            slot = 0
+
+        entry = self.model.entry(enc_state, action, slot)
+        prob_transition = float(self.model.prob[entry])
+        new_state = int(self.model.next_state[entry])
+        reward = float(self.model.reward[entry])
+        self.is_dead = bool(self.model.done[entry])
 
         self.days_left, self.life_points, _, _ = self.decode(new_state)
 
         if self.days_left <= 0:
             self.is_dead = True
 
-        return self._get_obs(), reward, self.is_dead, {"chance": chance, "prob_transition": prob_transition}
+        if self.info_level == "none":
+            info = {}
+        else:
+            info = {"chance": chance, "prob_transition": prob_transition}
+
+        return self._get_obs(), reward, self.is_dead, info
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        if seed is not None:
+            self._chances = []
+            self._chance_index = 0
+            self._chance_state = None
+            self._render_rng.seed(seed)
 
-    def reset(self, seed=42):
         self._get_new_day(with_days_left=True)
-        
+
+        self._is_rendered = self._num_episodes % self.render_every == 0 and (
+            self.render_fraction >= 1 or self._render_rng.random() < self.render_fraction
+        )
+        self._num_episodes += 1
+
         return self._get_obs()
 
-    def render(self, mode="human", close=False):
-        print(f"--Days left: {self.days_left}")
-        print(f"--State of Field: {self.field_state}")
-        print(f"--Current life: {self.life_points}")
-        print(f"--Type of Weather: {self.WEATHER_DICT[self.weather_type]}")
\ No newline at end of file
+    def render(self, mode=None, close=False):
+        mode = mode or self.render_mode or "human"
+        if mode != "ansi" and not self._is_rendered:
+            return
+
+        text = RENDER_TEMPLATE.format(
+            self.days_left,
+            " ".join(map(str, self.field_state.tolist())),
+            self.life_points,
+            self.WEATHER_DICT[self.weather_type],
+        )
+        if mode == "ansi":
+            return text
+
+        if self.render_sink is None:
+            self.render_sink = TextSink()
+        self.render_sink.write(text)
+
+    def close(self):
+        if self.render_sink is not None:
+            self.render_sink.flush()
\ No newline at end of file
@@ -1,17 +1,127 @@
+import random
+import time
 import numpy as np
-import pandas as pd
 
 from gymnasium import spaces, Env
-from itertools import product
+
+from foragym.envs.forests import (
+    ITEMS_PATH,
+    forests_from_frame,
+    forests_to_frame,
+    load_forests,
+)
+from foragym.envs import model_cache
+from foragym.envs.text_sink import TextSink
+from foragym.envs.transition_model import TransitionModel, get_shared_model
+
+# action that leads to each consequence in `consequences_dict`
+CONSEQUENCE_ACTIONS = np.array([1, 1, 1, 1, 1, 1, 0])
+WAIT_CONSEQUENCE = 6
+
+# life point change of a failed forage, a threat encounter and waiting
+FAILURE_PENALTY = -2.0
+THREAT_PENALTY = -3.0
+WAIT_PENALTY = -1.0
+
+# reward of the step that runs out of life points
+DEATH_REWARD = -1.0
+
+# number of uniforms drawn from `np_random` at a time
+CHANCE_BLOCK_SIZE = 1024
+
+# "full": forest parameters in every info; "minimal": env_choice only, except
+# at reset; "none": empty infos
+INFO_LEVELS = ("full", "minimal", "none")
+
+# text of "ansi" and "human" rendering, formatted once per render
+START_TEMPLATE = (
+    "--Forest Quality for the left environment: {:.2f}\n"
+    "--Threat Encounter probability for the left environment: {:.2f}\n"
+    "--Nutritional Quality for the left environment: {:.2f}\n"
+    "--Forest Quality for the right environment: {:.2f}\n"
+    "--Threat Encounter probability for the right environment: {:.2f}\n"
+    "--Nutritional Quality for the right environment: {:.2f}\n"
+    "----------\n"
+    "\n"
+)
+STEP_TEMPLATE = "--Consequence: {}\n--Reward?: {}\n--Episode done?: {}\n"
+STATE_TEMPLATE = (
+    "--Days left: {}\n"
+    "--Current life: {}\n"
+    "--Current Forest Quality: {:.2f}\n"
+    "--Current Threat Encounter probability: {:.2f}\n"
+    "--Current Nutritional Quality: {:.2f}\n"
+)
+
+
+def get_consequence_cdf(model):
+    """Cumulative probabilities of the forage outcomes, per state and env_choice.
+
+    Shaped [nS, 2, 3]; the outcomes (failed, successful, threat) of
+    env_choice `c` are the consequences `2 * outcome + 1 - c`.
+    """
+    states = np.flatnonzero(model.active)
+
+    cdf = np.zeros((model.nS, 2, 3))
+    cdf[states] = _get_states_cdf(model, states)
+    cdf.setflags(write=False)
+
+    return cdf
+
+
+def _get_states_cdf(model, states):
+    probs = model.prob[model.entries(states, 1)]
+    probs = np.stack([probs[:, 1::2], probs[:, ::2]], axis=1)
+    total = probs.sum(axis=2, keepdims=True)
+
+    return np.cumsum(probs / np.where(total > 0, total, 1), axis=2)
 
 
 class ForaGym_with_threat(Env):
     """ """
 
-    metadata = {"render_modes": ["human"]}
+    metadata = {"render_modes": ["human", "ansi"]}
+
+    def __init__(
+        self,
+        render_mode=None,
+        items_path="",
+        forests=None,
+        num_days=9,
+        num_life_points=7,
+        initial_life_points=(4, 6),
+        cache=True,
+        cache_dir=None,
+        flat_obs=False,
+        info_level="full",
+        render_every=1,
+        render_fraction=1.0,
+        render_sink=None,
+    ):
+        if info_level not in INFO_LEVELS:
+            raise ValueError(
+                f"info_level must be one of {INFO_LEVELS}, got {info_level!r}"
+            )
+        # life points of a new episode are drawn from low to high - 1
+        low, high = initial_life_points
+        if not 1 <= low < high <= num_life_points:
+            raise ValueError(
+                f"initial_life_points must satisfy 1 <= low < high <= "
+                f"num_life_points = {num_life_points}, got {initial_life_points}"
+            )
 
-    def __init__(self, render_mode=None, items_path=""):
         self.render_mode = render_mode
+        # human mode renders every `render_every`th episode, each kept with
+        # probability `render_fraction`, through `render_sink`, a
+        # buffered `TextSink` by default
+        self.render_every = render_every
+        self.render_fraction = render_fraction
+        self.render_sink = render_sink
+        self._render_rng = random.Random()
+        self._num_episodes = 0
+        self._is_rendered = True
+        self.flat_obs = flat_obs
+        self.info_level = info_level
 
         self.action_dict = {0: "wait", 1: "forage"}
         consequences = [
@@ -26,199 +136,486 @@ class ForaGym_with_threat(Env):
         self.consequences_dict = dict(zip(np.arange(0, 7), consequences))
 
         if not items_path:
-            self.items_path = "foragym/data/items_with_threat.csv"
+            self.items_path = ITEMS_PATH
         else:
             self.items_path = items_path
 
-        self.num_days = 9
-        self.num_life_points = 7
+        self.num_days = num_days
+        self.num_life_points = num_life_points
+        self.initial_life_points = initial_life_points
         self.done = False
         self.env_choice = 0
-
-        self.forests = self._get_forests(self.items_path)
-        self.num_forests = len(self.forests)
+        self.consequence_id = None
 
         self.num_envs = 2
-
-        self.nS = self.num_days * self.num_life_points * self.num_forests
         self.nA = len(self.action_dict)
 
-        self._get_transition_matrix()
+        self._chances = []
+        self._chance_index = 0
+        # state of `np_random` before drawing `_chances`, kept for snapshots
+        self._chance_state = None
+
+        # near zero for a shared model, longer when loaded from disk or built
+        start = time.perf_counter()
+        self._load_model(forests, cache, cache_dir)
+        self.model_load_time = time.perf_counter() - start
+
+        self._obs = np.zeros(5, dtype=np.float32)
+        self.observation_space = self._get_observation_space()
+        self.action_space = spaces.Discrete(self.nA)
+        self._init_episode()
+
+    def _get_observation_space(self):
+        max_param = max(2.0, float(self.forest_params.max()))
+
+        if self.flat_obs:
+            # days_left, life_points_left, forest quality, threat, nutrition
+            return spaces.Box(
+                low=0,
+                high=np.array(
+                    [self.num_days - 1, self.num_life_points - 1] + [max_param] * 3,
+                    dtype=np.float32,
+                ),
+                dtype=np.float32,
+            )
 
-        self.observation_space = spaces.Dict(
+        return spaces.Dict(
             {
                 "days_left": spaces.Discrete(self.num_days),
                 "life_points_left": spaces.Discrete(self.num_life_points),
                 "environment": spaces.Box(
-                    low=0, high=2.0, shape=(3,), dtype=np.float32
+                    low=0, high=max_param, shape=(3,), dtype=np.float32
                 ),
             }
         )
-        self.action_space = spaces.Discrete(self.nA)
-        self._init_episode()
 
     def _get_forests(self, items_path):
-        return pd.read_csv(items_path)
+        return load_forests(items_path)
 
-    def _get_consequences(self, payload):
-        if payload["consequence_id"] == 0 and payload["action"] == 1:
-            transition_prob = (1 - payload["forest_quality_left"]) * (
-                1 - payload["threat_encounter_left"]
-            )
-        elif payload["consequence_id"] == 1 and payload["action"] == 1:
-            transition_prob = (1 - payload["forest_quality_right"]) * (
-                1 - payload["threat_encounter_right"]
-            )
-        elif payload["consequence_id"] == 2 and payload["action"] == 1:
-            transition_prob = payload["forest_quality_left"] * (
-                1 - payload["threat_encounter_left"]
-            )
-        elif payload["consequence_id"] == 3 and payload["action"] == 1:
-            transition_prob = payload["forest_quality_right"] * (
-                1 - payload["threat_encounter_right"]
-            )
-        elif payload["consequence_id"] == 4 and payload["action"] == 1:
-            transition_prob = payload["threat_encounter_left"]
-        elif payload["consequence_id"] == 5 and payload["action"] == 1:
-            transition_prob = payload["threat_encounter_right"]
-        elif payload["consequence_id"] == 6 and payload["action"] == 0:
-            transition_prob = 2
+    def _get_model_config(self):
+        return {
+            # subclasses may change the dynamics
+            "env_class": f"{type(self).__module__}.{type(self).__qualname__}",
+            "num_days": self.num_days,
+            "num_life_points": self.num_life_points,
+            "num_envs": self.num_envs,
+            "actions": list(self.action_dict.values()),
+            "consequences": list(self.consequences_dict.values()),
+            "consequence_actions": CONSEQUENCE_ACTIONS.tolist(),
+        }
+
+    def _load_model(self, forests, cache, cache_dir):
+        """Set up the forest table and transition model.
+
+        The model is shared by all environments of this process with the same
+        forest source and `_get_model_config()`. With `cache`, it is
+        memory-mapped from an on-disk bundle under the same key, and built and
+        saved on a miss.
+        """
+        if forests is None:
+            with open(self.items_path, "rb") as f:
+                source = f.read()
+        elif hasattr(forests, "columns"):
+            source = forests = forests_from_frame(forests)
         else:
-            return []
+            source = forests = np.array(forests, dtype=np.float64)
 
-        transition_prob /= self.num_envs
+        key = model_cache.get_cache_key(source, self._get_model_config())
 
-        new_days_left = payload["days_left"] - 1
+        self.cache = cache
+        self.cache_dir = cache_dir
+        build = self._get_transition_matrix
+        self._set_model(
+            get_shared_model(key, lambda: self._build_model(key, forests, build))
+        )
 
-        if payload["consequence_id"] in (0, 1) and payload["action"] == 1:
-            new_life_points_left = payload["life_points_left"] - 2
-        elif payload["consequence_id"] == 2 and payload["action"] == 1:
-            new_life_points_left = (
-                payload["life_points_left"] + payload["nutritional_quality_left"]
-            )
-        elif payload["consequence_id"] == 3 and payload["action"] == 1:
-            new_life_points_left = (
-                payload["life_points_left"] + payload["nutritional_quality_right"]
-            )
-        elif payload["consequence_id"] in (4, 5) and payload["action"] == 1:
-            new_life_points_left = payload["life_points_left"] - 3
-        elif payload["consequence_id"] == 6 and payload["action"] == 0:
-            new_life_points_left = payload["life_points_left"] - 1
+    def _set_model(self, model):
+        """Use `model`, whose `params` become the forest table."""
+        self.model = model
+        self.P = self.model.P
+        self.consequence_cdf = self.model.derived(
+            "consequence_cdf", get_consequence_cdf
+        )
+        self._set_forests(self.model.params)
+
+    def _build_model(self, key, forests, build, save=True):
+        """Load the model under `key` from the disk cache, or `build()` it and,
+        with `save`, write it there."""
+        arrays = None
+        if self.cache:
+            arrays = model_cache.load(key, model_cache.MODEL_ARRAYS, self.cache_dir)
+        if arrays is not None:
+            return TransitionModel(**arrays)
+
+        if forests is None:
+            forests = self._get_forests(self.items_path)
+        self._set_forests(forests)
+
+        model = build()
+        if self.cache and save:
+            model_cache.save(key, model.arrays(), self.cache_dir)
+
+        return model
+
+    def update_forests(self, forests):
+        """Switch to another forest table, recomputing only the forests that changed.
+
+        `forests` is a DataFrame in the items CSV layout or an array of forest
+        parameters. Forests are matched by forest_type: those with unchanged
+        parameters keep their transitions, and so the `solve` results of their
+        states, while added or removed forest types grow or shrink the forest
+        dimension. The new model is shared like one built from scratch, and
+        loaded from the disk cache if there, but not saved to it, so that
+        switching tables often does not grow the cache. Takes effect from the
+        next `reset`.
+
+        Returns the forest types whose transitions were recomputed.
+        """
+        if hasattr(forests, "columns"):
+            forests = forests_from_frame(forests)
         else:
-            return []
+            forests = np.array(forests, dtype=np.float64)
+
+        old_model = self.model
+        old_forests = old_model.params
+        num_kept = min(len(old_forests), len(forests))
+        is_changed = np.ones(len(forests), dtype=bool)
+        is_changed[:num_kept] = np.any(
+            old_forests[:num_kept] != forests[:num_kept], axis=1
+        )
+        changed = np.flatnonzero(is_changed)
+
+        # the update helpers lay arrays out for the new forests, including
+        # when the model itself comes from the disk cache
+        self._set_forests(forests)
+
+        key = model_cache.get_cache_key(forests, self._get_model_config())
+        model = get_shared_model(
+            key,
+            lambda: self._build_model(
+                key,
+                forests,
+                lambda: self._update_transition_matrix(old_model, changed),
+                save=False,
+            ),
+        )
+        model.derived(
+            "consequence_cdf",
+            lambda model: self._update_consequence_cdf(model, old_model, changed),
+        )
+        self._set_model(model)
+        self.observation_space = self._get_observation_space()
 
-        new_life_points_left = np.clip(
-            new_life_points_left, 0, self.num_life_points - 1
+        return changed
+
+    def _set_forests(self, forest_params):
+        self.forest_params = forest_params
+        self.num_forests = len(forest_params)
+        self.nS = self.num_days * self.num_life_points * self.num_forests
+
+    @property
+    def forests(self):
+        """Forest table as a pandas DataFrame, in the items CSV layout."""
+        return forests_to_frame(self.forest_params)
+
+    def _get_consequences(self, forest_params):
+        """Probability and life point change of every consequence, per forest.
+
+        Both arrays are shaped [num_forests, num_consequences].
+        """
+        (
+            forest_quality_left,
+            threat_encounter_left,
+            nutritional_quality_left,
+            forest_quality_right,
+            threat_encounter_right,
+            nutritional_quality_right,
+        ) = forest_params.T
+        ones = np.ones(len(forest_params))
+
+        transition_prob = np.stack(
+            [
+                (1 - forest_quality_left) * (1 - threat_encounter_left),
+                (1 - forest_quality_right) * (1 - threat_encounter_right),
+                forest_quality_left * (1 - threat_encounter_left),
+                forest_quality_right * (1 - threat_encounter_right),
+                threat_encounter_left,
+                threat_encounter_right,
+                2 * ones,
+            ],
+            axis=1,
         )
+        transition_prob /= self.num_envs
 
-        new_enc_state = self.encode(
-            new_days_left, new_life_points_left, payload["forest_type"]
+        life_points_change = np.stack(
+            [
+                FAILURE_PENALTY * ones,
+                FAILURE_PENALTY * ones,
+                nutritional_quality_left,
+                nutritional_quality_right,
+                THREAT_PENALTY * ones,
+                THREAT_PENALTY * ones,
+                WAIT_PENALTY * ones,
+            ],
+            axis=1,
         )
 
-        if not new_life_points_left:
-            reward = -1
-            done = True
-        elif not new_days_left:
-            reward = 0
-            done = True
-        else:
-            reward = 0
-            done = False
+        return transition_prob, life_points_change
 
-        return [transition_prob, new_enc_state, reward, done]
+    def _get_forest_transitions(self, forest_types):
+        """Transition entries of the active states of `forest_types`.
+
+        Returns `prob`, `next_state`, `reward` and `done`, shaped
+        [num_days - 1, num_life_points - 1, len(forest_types), num_valid]: the
+        active states are those with days and life points left, and there
+        is one column per valid (action, slot) pair in `np.nonzero(valid)`
+        order.
+        """
+        transition_prob, life_points_change = self._get_consequences(
+            self.forest_params[forest_types]
+        )
+        _, slots = np.nonzero(self._get_valid())
+
+        days_left = np.arange(1, self.num_days)[:, None, None, None]
+        life_points_left = np.arange(1, self.num_life_points)[None, :, None, None]
+        forest_type = np.asarray(forest_types)[None, None, :, None]
+
+        new_days_left = days_left - 1
+        new_life_points_left = np.clip(
+            life_points_left + life_points_change[:, slots][None, None],
+            0,
+            self.num_life_points - 1,
+        ).astype(np.int64)
+        new_enc_state = self.encode(new_days_left, new_life_points_left, forest_type)
+
+        shape = new_enc_state.shape
+        return (
+            np.broadcast_to(transition_prob[:, slots][None, None], shape),
+            new_enc_state,
+            np.broadcast_to(np.where(new_life_points_left == 0, DEATH_REWARD, 0.0), shape),
+            np.broadcast_to((new_life_points_left == 0) | (new_days_left == 0), shape),
+        )
+
+    def _get_valid(self):
+        return CONSEQUENCE_ACTIONS[None, :] == np.arange(self.nA)[:, None]
+
+    def _get_active(self):
+        active = np.zeros((self.num_days, self.num_life_points, self.num_forests), bool)
+        active[1:, 1:] = True
+
+        return active.ravel()
 
     def _get_transition_matrix(self):
-        self.P = {
-            state: {action: [] for action in range(self.nA)} for state in range(self.nS)
-        }
+        transitions = self._get_forest_transitions(np.arange(self.num_forests))
+        valid = self._get_valid()
+        num_valid = int(valid.sum())
+
+        return TransitionModel.from_active(
+            self._get_active(),
+            valid,
+            *(array.reshape(-1, num_valid) for array in transitions),
+            state_shape=(self.num_days, self.num_life_points, self.num_forests),
+            params=self.forest_params,
+        )
 
-        for days_left in range(1, self.num_days):
-            for life_points_left in range(1, self.num_life_points):
-                for forest_type in range(self.num_forests):
-                    enc_state = self.encode(days_left, life_points_left, forest_type)
-
-                    forest_quality_left = self.forests.loc[
-                        self.forests["forest_type"] == forest_type,
-                        "forest_quality_left",
-                    ].values[0]
-                    threat_encounter_left = self.forests.loc[
-                        self.forests["forest_type"] == forest_type,
-                        "threat_encounter_left",
-                    ].values[0]
-                    nutritional_quality_left = self.forests.loc[
-                        self.forests["forest_type"] == forest_type,
-                        "nutritional_quality_left",
-                    ].values[0]
-                    forest_quality_right = self.forests.loc[
-                        self.forests["forest_type"] == forest_type,
-                        "forest_quality_right",
-                    ].values[0]
-                    threat_encounter_right = self.forests.loc[
-                        self.forests["forest_type"] == forest_type,
-                        "threat_encounter_right",
-                    ].values[0]
-                    nutritional_quality_right = self.forests.loc[
-                        self.forests["forest_type"] == forest_type,
-                        "nutritional_quality_right",
-                    ].values[0]
-
-                    for action in range(self.nA):
-                        for consequence_id in range(0, len(self.consequences_dict)):
-                            payload = {}
-                            payload["days_left"] = days_left
-                            payload["life_points_left"] = life_points_left
-                            payload["forest_type"] = forest_type
-                            payload["forest_quality_left"] = forest_quality_left
-                            payload["threat_encounter_left"] = threat_encounter_left
-                            payload[
-                                "nutritional_quality_left"
-                            ] = nutritional_quality_left
-                            payload["forest_quality_right"] = forest_quality_right
-                            payload["threat_encounter_right"] = threat_encounter_right
-                            payload[
-                                "nutritional_quality_right"
-                            ] = nutritional_quality_right
-                            payload["action"] = action
-                            payload["consequence_id"] = consequence_id
-
-                            payload["result"] = self._get_consequences(payload)
-
-                            if payload["result"]:
-                                self.P[enc_state][action].append(payload["result"])
+    def _update_transition_matrix(self, old_model, changed):
+        """`_get_transition_matrix()`, reusing the entries of `old_model` for the
+        forest types not in `changed`."""
+        valid = self._get_valid()
+        num_valid = int(valid.sum())
+        state_shape = (self.num_days, self.num_life_points, self.num_forests)
+
+        transitions = [
+            self._update_forest_array(
+                getattr(old_model, name).reshape(-1, num_valid), old_model, changed
+            )
+            for name in ["prob", "next_state", "reward", "done"]
+        ]
+
+        num_old_forests = old_model.state_shape[2]
+        if num_old_forests != self.num_forests:
+            # same day and life points, in the resized forest dimension
+            next_state = transitions[1].astype(np.int64)
+            transitions[1] = (
+                next_state // num_old_forests * self.num_forests
+                + next_state % num_old_forests
+            )
+
+        for array, new_array in zip(transitions, self._get_forest_transitions(changed)):
+            array[1:, 1:, changed] = new_array
+        transitions = [array[1:, 1:].reshape(-1, num_valid) for array in transitions]
+
+        if old_model.state_shape == state_shape:
+            prob, next_state, reward, done = (array.ravel() for array in transitions)
+            return TransitionModel(
+                old_model.indptr,
+                prob,
+                next_state,
+                reward,
+                done,
+                valid,
+                old_model.active,
+                state_shape,
+                params=self.forest_params,
+            )
+
+        return TransitionModel.from_active(
+            self._get_active(),
+            valid,
+            *transitions,
+            state_shape=state_shape,
+            params=self.forest_params,
+        )
+
+    def _update_consequence_cdf(self, model, old_model, changed):
+        old_cdf = old_model.derived("consequence_cdf", get_consequence_cdf)
+        cdf = self._update_forest_array(old_cdf, old_model, changed, all_states=True)
+
+        active = model.active.reshape(model.state_shape)
+        is_changed = np.zeros(model.state_shape, dtype=bool)
+        is_changed[:, :, changed] = active[:, :, changed]
+        states = np.flatnonzero(is_changed)
+
+        cdf = cdf.reshape(model.nS, 2, 3)
+        cdf[states] = _get_states_cdf(model, states)
+        cdf.setflags(write=False)
+
+        return cdf
+
+    def _update_forest_array(self, old_array, old_model, changed, all_states=False):
+        """Copy of per-state `old_array` of `old_model`, laid out for the current
+        forests, shaped [num_days, num_life_points, num_forests, ...].
+
+        Rows of the forest types in `changed` are left uninitialized, as are
+        the inactive states unless `all_states`, i.e. `old_array` holds a row
+        per state rather than per active state.
+        """
+        num_days, num_life_points, num_old_forests = old_model.state_shape
+        shape = (num_days, num_life_points, self.num_forests) + old_array.shape[1:]
+        array = np.zeros(shape, dtype=old_array.dtype)
+
+        offset = 0 if all_states else 1
+        old_array = old_array.reshape(
+            (num_days - offset, num_life_points - offset, num_old_forests)
+            + old_array.shape[1:]
+        )
+
+        num_kept = min(num_old_forests, self.num_forests)
+        array[offset:, offset:, :num_kept] = old_array[:, :, :num_kept]
+
+        return array
 
     def _init_episode(self):
         self.days_left = self.num_days - 1
 
-        self.life_points_left = np.random.randint(4, 6)
-        self.forest_type = np.random.randint(0, self.num_forests - 1)
-
-        self.forest_quality_left = self.forests.loc[
-            self.forests["forest_type"] == self.forest_type, "forest_quality_left"
-        ].values[0]
-        self.threat_encounter_left = self.forests.loc[
-            self.forests["forest_type"] == self.forest_type, "threat_encounter_left"
-        ].values[0]
-        self.nutritional_quality_left = self.forests.loc[
-            self.forests["forest_type"] == self.forest_type, "nutritional_quality_left"
-        ].values[0]
-        self.forest_quality_right = self.forests.loc[
-            self.forests["forest_type"] == self.forest_type, "forest_quality_right"
-        ].values[0]
-        self.threat_encounter_right = self.forests.loc[
-            self.forests["forest_type"] == self.forest_type, "threat_encounter_right"
-        ].values[0]
-        self.nutritional_quality_right = self.forests.loc[
-            self.forests["forest_type"] == self.forest_type, "nutritional_quality_right"
-        ].values[0]
+        low, high = self.initial_life_points
+        self.life_points_left = low + int((high - low) * self._get_chance())
+        self.forest_type = int((self.num_forests - 1) * self._get_chance())
+
+        (
+            self.forest_quality_left,
+            self.threat_encounter_left,
+            self.nutritional_quality_left,
+            self.forest_quality_right,
+            self.threat_encounter_right,
+            self.nutritional_quality_right,
+        ) = self.forest_params[self.forest_type]
+
+    def get_initial_distribution(self):
+        """Probability of each encoded state at the start of an episode."""
+        low, high = self.initial_life_points
+        dist = np.zeros((self.num_days, self.num_life_points, self.num_forests))
+        dist[-1, low:high, : max(self.num_forests - 1, 1)] = 1
+
+        return (dist / dist.sum()).ravel()
+
+    def _get_chance(self):
+        """Next uniform of the episode stream, drawn from `np_random` in blocks."""
+        if self._chance_index == len(self._chances):
+            self._chance_state = self.np_random.bit_generator.state
+            self._chances = self.np_random.random(CHANCE_BLOCK_SIZE).tolist()
+            self._chance_index = 0
+
+        chance = self._chances[self._chance_index]
+        self._chance_index += 1
+
+        return chance
+
+    def get_state(self):
+        """Snapshot of the episode, to be restored with `set_state`.
+
+        A flat tuple of the episode variables (days_left, life_points_left,
+        forest_type, env_choice, done, reward, consequence_id), the index in
+        the chance block and the state of `np_random` the block was drawn
+        from, so the block itself is redrawn rather than stored.
+        """
+        if self._chance_index:
+            rng_state = self._chance_state
+        else:
+            rng_state = self.np_random.bit_generator.state
+
+        return (
+            self.days_left,
+            self.life_points_left,
+            self.forest_type,
+            self.env_choice,
+            self.done,
+            getattr(self, "reward", 0.0),
+            self.consequence_id,
+            self._chance_index,
+            rng_state,
+        )
+
+    def set_state(self, state):
+        """Restore a snapshot of `get_state`, possibly taken from another env
+        with the same parameters."""
+        (
+            self.days_left,
+            self.life_points_left,
+            self.forest_type,
+            self.env_choice,
+            self.done,
+            self.reward,
+            self.consequence_id,
+            chance_index,
+            rng_state,
+        ) = state
+
+        # the current block is kept when the snapshot was taken from it
+        if not chance_index or rng_state is not self._chance_state:
+            self.np_random.bit_generator.state = rng_state
+            self._chances = []
+            self._chance_index = 0
+            if chance_index:
+                self._get_chance()
+        self._chance_index = chance_index
+
+        (
+            self.forest_quality_left,
+            self.threat_encounter_left,
+            self.nutritional_quality_left,
+            self.forest_quality_right,
+            self.threat_encounter_right,
+            self.nutritional_quality_right,
+        ) = self.forest_params[self.forest_type]
+
+        if self.env_choice:
+            self.forest_quality = self.forest_quality_left
+            self.threat_encounter = self.threat_encounter_left
+            self.nutritional_quality = self.nutritional_quality_left
+        else:
+            self.forest_quality = self.forest_quality_right
+            self.threat_encounter = self.threat_encounter_right
+            self.nutritional_quality = self.nutritional_quality_right
 
     def encode(self, days_left, life_points_left, forest_type):
         enc_state = days_left
 
-        enc_state *= self.num_life_points
-        enc_state += life_points_left
+        enc_state = enc_state * self.num_life_points
+        enc_state = enc_state + life_points_left
 
-        enc_state *= self.num_forests
-        enc_state += forest_type
+        enc_state = enc_state * self.num_forests
+        enc_state = enc_state + forest_type
 
         return enc_state
 
@@ -235,6 +632,16 @@ class ForaGym_with_threat(Env):
         return list(reversed(out))
 
     def _get_obs(self):
+        if self.flat_obs:
+            # written in place: the same array is returned at every step
+            obs = self._obs
+            obs[0] = self.days_left
+            obs[1] = self.life_points_left
+            obs[2] = self.forest_quality
+            obs[3] = self.threat_encounter
+            obs[4] = self.nutritional_quality
+            return obs
+
         return {
             "days_left": int(self.days_left),
             "life_points_left": int(self.life_points_left),
@@ -246,10 +653,16 @@ class ForaGym_with_threat(Env):
 
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
+        if seed is not None:
+            self._chances = []
+            self._chance_index = 0
+            self._chance_state = None
+            self._render_rng.seed(seed)
 
         self._init_episode()
+        self.consequence_id = None
 
-        self.env_choice = np.random.choice([0, 1])
+        self.env_choice = int(2 * self._get_chance())
 
         if self.env_choice:
             self.forest_quality = self.forest_quality_left
@@ -261,9 +674,23 @@ class ForaGym_with_threat(Env):
             self.nutritional_quality = self.nutritional_quality_right
 
         if self.render_mode == "human":
-            self.render_text(is_start=True)
+            self._is_rendered = self._num_episodes % self.render_every == 0 and (
+                self.render_fraction >= 1
+                or self._render_rng.random() < self.render_fraction
+            )
+            self._num_episodes += 1
+            if self._is_rendered:
+                self.render_text(is_start=True)
+
+        return self._get_obs(), self._get_info(is_reset=True)
+
+    def _get_info(self, is_reset=False):
+        if self.info_level == "none":
+            return {}
+        if self.info_level == "minimal" and not is_reset:
+            return {"env_choice": self.env_choice}
 
-        return self._get_obs(), {
+        return {
             "env_choice": self.env_choice,
             "forest_quality_left": self.forest_quality_left,
             "threat_encounter_left": self.threat_encounter_left,
@@ -274,46 +701,39 @@ class ForaGym_with_threat(Env):
         }
 
     def render(self):
-        if self.render_mode == "human":
-            self.render_text()
+        if self.render_mode == "human" and self._is_rendered:
+            self.render_text(is_start=self.consequence_id is None)
+        elif self.render_mode == "ansi":
+            return self._get_text(is_start=self.consequence_id is None)
 
     def render_text(self, is_start=False):
+        if self.render_sink is None:
+            self.render_sink = TextSink()
+        self.render_sink.write(self._get_text(is_start))
+
+    def _get_text(self, is_start=False):
         if is_start:
-            print(
-                f"--Forest Quality for the left environment: {self.forest_quality_left:.2f}"
-            )
-            print(
-                f"--Threat Encounter probability for the left environment: {self.threat_encounter_left:.2f}"
-            )
-            print(
-                f"--Nutritional Quality for the left environment: {self.nutritional_quality_left:.2f}"
-            )
-            print(
-                f"--Forest Quality for the right environment: {self.forest_quality_right:.2f}"
-            )
-            print(
-                f"--Threat Encounter probability for the right environment: {self.threat_encounter_right:.2f}"
-            )
-            print(
-                f"--Nutritional Quality for the right environment: {self.nutritional_quality_right:.2f}"
-            )
-            print("-" * 10)
-            print("")
+            text = START_TEMPLATE.format(*self.forest_params[self.forest_type])
         else:
-            print(f"--Consequence: {self.consequences_dict[self.consequence_id]}")
-            print(f"--Reward?: {self.reward}")
-            print(f"--Episode done?: {self.done}")
+            text = STEP_TEMPLATE.format(
+                self.consequences_dict[self.consequence_id], self.reward, self.done
+            )
 
-        print(f"--Days left: {self.days_left}")
-        print(f"--Current life: {self.life_points_left}")
-        print(f"--Current Forest Quality: {self.forest_quality:.2f}")
-        print(f"--Current Threat Encounter probability: {self.threat_encounter:.2f}")
-        print(f"--Current Nutritional Quality: {self.nutritional_quality:.2f}")
+        return text + STATE_TEMPLATE.format(
+            self.days_left,
+            self.life_points_left,
+            self.forest_quality,
+            self.threat_encounter,
+            self.nutritional_quality,
+        )
 
     def close(self):
-        pass
+        if self.render_sink is not None:
+            self.render_sink.flush()
 
     def step(self, action):
+        if self.life_points_left <= 0:
+            raise RuntimeError("the episode is over, call reset")
         if self.days_left <= 0:
             self.done = True
             return (
@@ -321,29 +741,29 @@ class ForaGym_with_threat(Env):
                 self.reward,
                 self.done,
                 False,
-                {"env_choice": self.env_choice},
+                {} if self.info_level == "none" else {"env_choice": self.env_choice},
             )
 
+        action = int(action)
         enc_state = self.encode(self.days_left, self.life_points_left, self.forest_type)
-        P = self.P[enc_state][action]
 
         if action:
-            probs = [prob for (prob, _, _, _) in P]
-            if self.env_choice:
-                probs = [i * 2 for i in probs[::2]]
-            else:
-                probs = [i * 2 for i in probs[1::2]]
-            self.consequence_id = np.random.choice(np.arange(0, 3), p=probs)
-            if self.env_choice:
-                self.consequence_id *= 2
-            else:
-                self.consequence_id = self.consequence_id * 2 + 1
-            prob, new_enc_state, self.reward, self.done = P[self.consequence_id]
+            chance = self._get_chance()
+            cdf = self.consequence_cdf
+            outcome = int(chance >= cdf[enc_state, self.env_choice, 0]) + int(
+                chance >= cdf[enc_state, self.env_choice, 1]
+            )
+            self.consequence_id = 2 * outcome + 1 - self.env_choice
         else:
-            self.consequence_id = 6
-            prob, new_enc_state, self.reward, self.done = P[0]
+            self.consequence_id = WAIT_CONSEQUENCE
 
-        self.env_choice = np.random.choice([0, 1])
+        model = self.model
+        entry = model.entry(enc_state, action, self.consequence_id)
+        new_enc_state = int(model.next_state[entry])
+        self.reward = float(model.reward[entry])
+        self.done = bool(model.done[entry])
+
+        self.env_choice = int(2 * self._get_chance())
         if self.env_choice:
             self.forest_quality = self.forest_quality_left
             self.threat_encounter = self.threat_encounter_left
@@ -355,21 +775,7 @@ class ForaGym_with_threat(Env):
 
         self.days_left, self.life_points_left, _ = self.decode(new_enc_state)
 
-        if self.render_mode == "human":
+        if self.render_mode == "human" and self._is_rendered:
             self.render_text(is_start=False)
 
-        return (
-            self._get_obs(),
-            float(self.reward),
-            self.done,
-            False,
-            {
-                "env_choice": self.env_choice,
-                "forest_quality_left": self.forest_quality_left,
-                "threat_encounter_left": self.threat_encounter_left,
-                "nutritional_quality_left": self.nutritional_quality_left,
-                "forest_quality_right": self.forest_quality_right,
-                "threat_encounter_right": self.threat_encounter_right,
-                "nutritional_quality_right": self.nutritional_quality_right,
-            },
-        )
+        return self._get_obs(), self.reward, self.done, False, self._get_info()
@@ -0,0 +1,60 @@
+import csv
+import os
+import numpy as np
+
+ITEMS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data",
+    "items_with_threat.csv",
+)
+
+FOREST_PARAMS = [
+    "forest_quality_left",
+    "threat_encounter_left",
+    "nutritional_quality_left",
+    "forest_quality_right",
+    "threat_encounter_right",
+    "nutritional_quality_right",
+]
+
+
+def load_forests(items_path=""):
+    """Read an items CSV into a [num_forests, len(FOREST_PARAMS)] float array.
+
+    Row `i` holds the parameters of forest_type `i`, in `FOREST_PARAMS` order.
+    """
+    with open(items_path or ITEMS_PATH, newline="") as f:
+        header = next(csv.reader(f))
+        values = np.loadtxt(f, delimiter=",", ndmin=2)
+
+    columns = [header.index(name) for name in ["forest_type"] + FOREST_PARAMS]
+    values = values[:, columns]
+
+    return _index_by_forest_type(values[:, 0], values[:, 1:])
+
+
+def forests_from_frame(forests):
+    """Convert a DataFrame with the items CSV columns into a forest table."""
+    values = forests[["forest_type"] + FOREST_PARAMS].to_numpy(dtype=np.float64)
+
+    return _index_by_forest_type(values[:, 0], values[:, 1:])
+
+
+def forests_to_frame(forest_params):
+    import pandas as pd
+
+    forests = pd.DataFrame(forest_params, columns=FOREST_PARAMS)
+    forests.insert(0, "forest_type", np.arange(len(forest_params)))
+
+    return forests
+
+
+def _index_by_forest_type(forest_type, params):
+    forest_type = forest_type.astype(np.int64)
+    if not np.array_equal(np.sort(forest_type), np.arange(len(forest_type))):
+        raise ValueError("forest_type must enumerate the forests as 0..num_forests-1")
+
+    forest_params = np.empty_like(params)
+    forest_params[forest_type] = params
+
+    return np.ascontiguousarray(forest_params)
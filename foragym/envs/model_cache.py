@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+# bump whenever the layout or the construction of cached arrays changes
+CACHE_VERSION = 3
+
+MODEL_ARRAYS = [
+    "indptr",
+    "prob",
+    "next_state",
+    "reward",
+    "done",
+    "valid",
+    "active",
+    "state_shape",
+    "params",
+]
+
+
+def get_cache_dir(cache_dir=None):
+    if cache_dir:
+        return cache_dir
+    if os.environ.get("FORAGYM_CACHE_DIR"):
+        return os.environ["FORAGYM_CACHE_DIR"]
+
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "foragym")
+
+
+def get_cache_key(source, config):
+    """Hash the raw forest source (CSV bytes or array) and the env constants."""
+    digest = hashlib.sha256()
+    digest.update(f"foragym-model-v{CACHE_VERSION}".encode())
+    if not isinstance(source, bytes):
+        source = np.ascontiguousarray(source, dtype=np.float64).tobytes()
+    digest.update(source)
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode())
+
+    return digest.hexdigest()
+
+
+def load(key, names, cache_dir=None):
+    """Memory-map the arrays cached under `key`, or return None on a miss."""
+    path = os.path.join(get_cache_dir(cache_dir), key)
+
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["key"] != key or sorted(meta["arrays"]) != sorted(names):
+            return None
+
+        # plain ndarray views of the read-only maps, without memmap overhead
+        return {
+            name: np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+            for name in names
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save(key, arrays, cache_dir=None):
+    """Write `arrays` under `key`; a stale or partial entry is replaced.
+
+    The entry is assembled in a temporary directory and renamed into place,
+    so concurrent readers never see a partially written bundle. Failures to
+    write (e.g. a read-only cache directory) are ignored.
+    """
+    root = get_cache_dir(cache_dir)
+    path = os.path.join(root, key)
+
+    try:
+        os.makedirs(root, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(prefix=f".{key}-", dir=root)
+    except OSError:
+        return
+
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.asarray(array))
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump({"key": key, "arrays": sorted(arrays)}, f)
+
+        if os.path.exists(path):
+            shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def clear(cache_dir=None):
+    """Remove every cached bundle; returns the number removed."""
+    root = get_cache_dir(cache_dir)
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return 0
+
+    num_removed = 0
+    for name in names:
+        path = os.path.join(root, name)
+        if os.path.exists(os.path.join(path, "meta.json")) or name.startswith("."):
+            shutil.rmtree(path, ignore_errors=True)
+            num_removed += not name.startswith(".")
+
+    return num_removed
@@ -0,0 +1,46 @@
+import sys
+import time
+import weakref
+
+
+def _write(parts, stream):
+    if parts:
+        stream = stream or sys.stdout
+        stream.write("".join(parts))
+        stream.flush()
+        parts.clear()
+
+
+class TextSink:
+    """Buffered, rate-limited text output of human rendering.
+
+    Text is collected in memory and written to `stream` (stdout by default)
+    in one call at most every `interval` seconds, or sooner once
+    `max_buffered` characters are pending. Pending text is written by
+    `flush`, and at the latest when the sink is garbage collected or the
+    interpreter exits. With the default `interval` of 0 every render is
+    written at once, as a single write.
+    """
+
+    def __init__(self, stream=None, interval=0.0, max_buffered=65536):
+        self.stream = stream
+        self.interval = interval
+        self.max_buffered = max_buffered
+
+        self._parts = []
+        self._size = 0
+        self._next_flush = 0.0
+        self._finalizer = weakref.finalize(self, _write, self._parts, stream)
+
+    def write(self, text):
+        self._parts.append(text)
+        self._size += len(text)
+
+        now = time.monotonic()
+        if now >= self._next_flush or self._size >= self.max_buffered:
+            self.flush(now)
+
+    def flush(self, now=None):
+        _write(self._parts, self.stream)
+        self._size = 0
+        self._next_flush = (time.monotonic() if now is None else now) + self.interval
@@ -0,0 +1,205 @@
+import weakref
+import numpy as np
+
+from collections.abc import Mapping
+from operator import index
+
+# models in use in this process, keyed by their configuration
+_shared_models = weakref.WeakValueDictionary()
+
+
+def get_shared_model(key, build):
+    """Return the model registered under `key`, calling `build()` on first use.
+
+    Models are immutable, so every environment with the same configuration
+    holds the same instance; it is released once no environment uses it.
+    """
+    model = _shared_models.get(key)
+    if model is None:
+        model = build()
+        _shared_models[key] = model
+
+    return model
+
+
+class TransitionModel:
+    """Sparse (CSR) transition store of a tabular environment.
+
+    The transitions of (state, action) are the entries
+    `indptr[state * nA + action]:indptr[state * nA + action + 1]` of `prob`,
+    `next_state`, `reward` and `done`. Only states with `active[s]` have
+    entries; they use the slots `k` with `valid[a, k]` of each action, in
+    increasing order, out of K slots per (state, action). `state_shape` gives
+    the factors of the state encoding, most significant (days left) first, and
+    `params` the environment parameters the model was built from, if any.
+
+    All arrays are read-only and copies of the model share them.
+    """
+
+    def __init__(
+        self,
+        indptr,
+        prob,
+        next_state,
+        reward,
+        done,
+        valid,
+        active,
+        state_shape,
+        params=None,
+    ):
+        self.indptr = indptr
+        self.prob = prob
+        self.next_state = next_state
+        self.reward = reward
+        self.done = done
+        self.valid = valid
+        self.active = active
+        self.params = params
+
+        for array in (indptr, prob, next_state, reward, done, valid, active, params):
+            if array is not None:
+                array.setflags(write=False)
+
+        self.nA, self.K = valid.shape
+        self.nS = len(active)
+        self.state_shape = tuple(int(n) for n in state_shape)
+        self.P = TransitionView(self)
+
+        # position of slot k among the entries of a row of action a
+        self.slot_position = np.cumsum(valid, axis=1) - 1
+
+        self._derived = {}
+
+    @classmethod
+    def from_active(
+        cls, active, valid, prob, next_state, reward, done, state_shape, params=None
+    ):
+        """Build a model from per-transition arrays of the active states.
+
+        `prob`, `next_state`, `reward` and `done` are shaped
+        [num_active_states, num_valid], with one column per valid
+        (action, slot) pair in `np.nonzero(valid)` order.
+        """
+        row_length = np.where(active[:, None], valid.sum(axis=1)[None, :], 0)
+        indptr = np.zeros(row_length.size + 1, dtype=np.int64)
+        np.cumsum(row_length, out=indptr[1:])
+
+        state_dtype = np.int32 if len(active) < 2**31 else np.int64
+
+        return cls(
+            indptr=indptr,
+            prob=np.ascontiguousarray(prob, dtype=np.float64).ravel(),
+            next_state=np.ascontiguousarray(next_state, dtype=state_dtype).ravel(),
+            reward=np.ascontiguousarray(reward, dtype=np.float64).ravel(),
+            done=np.ascontiguousarray(done, dtype=bool).ravel(),
+            valid=valid,
+            active=active,
+            state_shape=state_shape,
+            params=params,
+        )
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def derived(self, name, build):
+        """Table computed from the model by `build(model)` once, then shared."""
+        if name not in self._derived:
+            self._derived[name] = build(self)
+
+        return self._derived[name]
+
+    def entry(self, state, action, slot):
+        """Index of the entry of `slot` in the row of (state, action)."""
+        row = state * self.nA + action
+        start = self.indptr[row]
+        assert (self.indptr[row + 1] > start).all(), "no transitions from state"
+
+        return start + self.slot_position[action, slot]
+
+    def entries(self, states, action):
+        """Entry indices of the rows of (states, action), shaped [len(states), n]."""
+        num_slots = int(self.valid[action].sum())
+
+        return self.indptr[states * self.nA + action][:, None] + np.arange(num_slots)
+
+    def transitions(self, state, action):
+        row = state * self.nA + action
+        return [
+            [
+                float(self.prob[i]),
+                int(self.next_state[i]),
+                float(self.reward[i]),
+                bool(self.done[i]),
+            ]
+            for i in range(self.indptr[row], self.indptr[row + 1])
+        ]
+
+    def arrays(self):
+        """Constructor arguments of the model, as arrays."""
+        arrays = {
+            "indptr": self.indptr,
+            "prob": self.prob,
+            "next_state": self.next_state,
+            "reward": self.reward,
+            "done": self.done,
+            "valid": self.valid,
+            "active": self.active,
+            "state_shape": np.array(self.state_shape),
+        }
+        if self.params is not None:
+            arrays["params"] = self.params
+
+        return arrays
+
+    @property
+    def nbytes(self):
+        return sum(
+            array.nbytes
+            for array in (
+                self.indptr,
+                self.prob,
+                self.next_state,
+                self.reward,
+                self.done,
+            )
+        )
+
+
+class TransitionView(Mapping):
+    """Lazy read-only `P[state][action]` view over a `TransitionModel`.
+
+    Each lookup builds the `[prob, next_state, reward, done]` lists of the
+    legacy dict-of-lists layout on demand.
+    """
+
+    def __init__(self, model, state=None):
+        self.model = model
+        self.state = state
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __getitem__(self, key):
+        key = index(key)
+
+        if self.state is None:
+            if not 0 <= key < self.model.nS:
+                raise KeyError(key)
+            return TransitionView(self.model, key)
+
+        if not 0 <= key < self.model.nA:
+            raise KeyError(key)
+        return self.model.transitions(self.state, key)
+
+    def __len__(self):
+        return self.model.nS if self.state is None else self.model.nA
+
+    def __iter__(self):
+        return iter(range(len(self)))
@@ -0,0 +1,165 @@
+import json
+import os
+import time
+import numpy as np
+
+
+class EnvMetrics:
+    """Counters and timers of one instrumented environment.
+
+    Times are totals in seconds, measured with `time.perf_counter`;
+    `model_load_time` is kept by `reset`.
+    """
+
+    def __init__(self, num_actions, num_consequences=0, model_load_time=None):
+        self.num_actions = num_actions
+        self.num_consequences = num_consequences
+        self.model_load_time = model_load_time
+        self.reset()
+
+    def reset(self):
+        self.start_time = time.time()
+        self.resets = 0
+        self.steps = 0
+        self.episodes = 0
+        self.episode_steps = 0
+        self.action_counts = np.zeros(self.num_actions, dtype=np.int64)
+        self.consequence_counts = np.zeros(self.num_consequences, dtype=np.int64)
+        self.episode_lengths = np.zeros(0, dtype=np.int64)
+        self.times = {"reset": 0.0, "step": 0.0, "render": 0.0}
+
+    def add_episode(self, length):
+        if length >= len(self.episode_lengths):
+            self.episode_lengths = np.pad(
+                self.episode_lengths, (0, length + 1 - len(self.episode_lengths))
+            )
+        self.episode_lengths[length] += 1
+        self.episodes += 1
+
+    def snapshot(self):
+        """JSON-serializable copy of the metrics, with derived rates."""
+        lengths = np.arange(len(self.episode_lengths))
+
+        return {
+            "timestamp": time.time(),
+            "elapsed_s": time.time() - self.start_time,
+            "resets": self.resets,
+            "steps": self.steps,
+            "episodes": self.episodes,
+            "action_counts": self.action_counts.tolist(),
+            "consequence_counts": self.consequence_counts.tolist(),
+            # episode_lengths[n]: number of episodes of n steps
+            "episode_lengths": self.episode_lengths.tolist(),
+            "mean_episode_length": (
+                float(lengths @ self.episode_lengths / self.episodes)
+                if self.episodes
+                else None
+            ),
+            "model_load_s": self.model_load_time,
+            "times_s": dict(self.times),
+            "steps_per_s": (
+                self.steps / self.times["step"] if self.times["step"] else None
+            ),
+        }
+
+    def dump(self, path):
+        """Write `snapshot()` to `path` as JSON, replacing it atomically."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+
+class InstrumentedEnv:
+    """Wraps a ForaGym environment (v0 or v1) and records `EnvMetrics`.
+
+    Only wrapped environments pay for the bookkeeping; nothing is measured
+    inside the environment classes apart from `model_load_time`. Render time
+    includes the `render_text` calls made from `reset` and `step` in human
+    mode, and is also counted in the reset and step times.
+
+    With `dump_path`, the metrics are written there as JSON every
+    `dump_interval` seconds (checked after each step) and on `close`.
+    """
+
+    def __init__(self, env, dump_path=None, dump_interval=60.0):
+        self.env = env
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+
+        unwrapped = env.unwrapped
+        self.metrics = EnvMetrics(
+            env.action_space.n,
+            len(getattr(unwrapped, "consequences_dict", ())),
+            getattr(unwrapped, "model_load_time", None),
+        )
+        self._next_dump = time.perf_counter() + dump_interval
+
+        # time the text rendering done inside reset and step
+        self._render_text = getattr(unwrapped, "render_text", None)
+        if self._render_text is not None:
+            unwrapped.render_text = self._timed_render_text
+
+    def __getattr__(self, name):
+        return getattr(self.env, name)
+
+    def _timed_render_text(self, *args, **kwargs):
+        start = time.perf_counter()
+        self._render_text(*args, **kwargs)
+        self.metrics.times["render"] += time.perf_counter() - start
+
+    def reset(self, **kwargs):
+        start = time.perf_counter()
+        result = self.env.reset(**kwargs)
+        self.metrics.times["reset"] += time.perf_counter() - start
+
+        self.metrics.resets += 1
+        self.metrics.episode_steps = 0
+
+        return result
+
+    def step(self, action):
+        start = time.perf_counter()
+        result = self.env.step(action)
+        now = time.perf_counter()
+
+        metrics = self.metrics
+        metrics.times["step"] += now - start
+        metrics.steps += 1
+        metrics.episode_steps += 1
+        metrics.action_counts[int(action)] += 1
+
+        consequence_id = getattr(self.env.unwrapped, "consequence_id", None)
+        if consequence_id is not None:
+            metrics.consequence_counts[consequence_id] += 1
+
+        # (obs, reward, terminated, truncated, info), or (obs, reward, done, info)
+        if result[2] or (len(result) == 5 and result[3]):
+            metrics.add_episode(metrics.episode_steps)
+            metrics.episode_steps = 0
+
+        if self.dump_path and now >= self._next_dump:
+            self._next_dump = now + self.dump_interval
+            metrics.dump(self.dump_path)
+
+        return result
+
+    def render(self, *args, **kwargs):
+        if self._render_text is not None:
+            # already timed through render_text
+            return self.env.render(*args, **kwargs)
+
+        start = time.perf_counter()
+        result = self.env.render(*args, **kwargs)
+        self.metrics.times["render"] += time.perf_counter() - start
+
+        return result
+
+    def close(self):
+        if self._render_text is not None:
+            del self.env.unwrapped.render_text
+            self._render_text = None
+        if self.dump_path:
+            self.metrics.dump(self.dump_path)
+
+        return self.env.close()
@@ -0,0 +1,233 @@
+import os
+import multiprocessing
+import numpy as np
+
+from multiprocessing import shared_memory
+
+from foragym.envs.foragym_with_threat import ForaGym_with_threat
+from foragym.envs.transition_model import TransitionModel
+from foragym.planning import get_action_probs
+from foragym.vector import draw_episodes, get_environments, step_episodes
+
+# offsets of arrays packed in a shared block are multiples of this
+ALIGNMENT = 64
+
+# state of a worker process, set up once by `_init_worker`
+_worker = {}
+
+
+def _share(arrays):
+    """Copy `arrays` into one new shared memory block.
+
+    Returns the block and a picklable spec that `_attach` turns back into
+    array views of it.
+    """
+    layout = []
+    size = 0
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        layout.append((name, array.dtype.str, array.shape, size))
+        size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    spec = {"name": shm.name, "layout": layout}
+    for name, view in _get_views(shm, spec).items():
+        view[...] = arrays[name]
+
+    return shm, spec
+
+
+def _attach(spec):
+    shm = shared_memory.SharedMemory(name=spec["name"])
+    return shm, _get_views(shm, spec)
+
+
+def _get_views(shm, spec):
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        for name, dtype, shape, offset in spec["layout"]
+    }
+
+
+def _init_worker(model_spec, config):
+    shm, arrays = _attach(model_spec)
+
+    _worker.clear()
+    _worker["shm"] = shm
+    _worker["config"] = config
+    _worker["consequence_cdf"] = arrays.pop("consequence_cdf")
+    _worker["environments"] = arrays.pop("environments")
+    _worker["model"] = TransitionModel(**arrays)
+
+
+def _run_task(output_spec, start, stop, seed, policy):
+    """Play the episodes `start:stop` into the shared output block."""
+    shm, output = _attach(output_spec)
+    returns, lengths = _run_episodes(stop - start, seed, output.get("cum_probs"), policy)
+    output["returns"][start:stop] = returns
+    output["lengths"][start:stop] = lengths
+
+    del output
+    shm.close()
+
+
+def _run_episodes(num_episodes, seed, cum_probs, policy):
+    """Play `num_episodes` ForaGym-v1 episodes side by side until all are done.
+
+    Episodes are drawn and stepped by the helpers of `ForaGymThreatVector`.
+    Actions are drawn from the cumulative action probabilities `cum_probs`
+    per state or, if None, returned by `policy` for the batched observations.
+    """
+    model = _worker["model"]
+    cdf = _worker["consequence_cdf"]
+    environments = _worker["environments"]
+    num_days, num_life_points, num_forests = model.state_shape
+
+    rng = np.random.default_rng(seed)
+
+    episodes = np.arange(num_episodes)
+    days_left, life_points_left, forest_type, env_choice = draw_episodes(
+        rng,
+        num_episodes,
+        num_days,
+        num_forests,
+        _worker["config"]["initial_life_points"],
+    )
+
+    returns = np.zeros(num_episodes)
+    lengths = np.zeros(num_episodes, dtype=np.int32)
+
+    while len(episodes):
+        enc_state = (
+            days_left * num_life_points + life_points_left
+        ) * num_forests + forest_type
+
+        if cum_probs is None:
+            obs = {
+                "days_left": days_left,
+                "life_points_left": life_points_left,
+                "environment": environments[forest_type, env_choice],
+            }
+            actions = np.asarray(policy(obs), dtype=np.int64)
+        else:
+            chance = rng.random(len(episodes))
+            actions = (cum_probs[enc_state, :-1] <= chance[:, None]).sum(axis=1)
+
+        days_left, life_points_left, env_choice, rewards, dones, _ = step_episodes(
+            model,
+            cdf,
+            rng,
+            days_left,
+            life_points_left,
+            forest_type,
+            env_choice,
+            actions,
+        )
+        returns[episodes] += rewards
+        lengths[episodes] += 1
+
+        running = ~dones
+        episodes = episodes[running]
+        days_left = days_left[running]
+        life_points_left = life_points_left[running]
+        forest_type = forest_type[running]
+        env_choice = env_choice[running]
+
+    return returns, lengths
+
+
+class RolloutCollector:
+    """Plays ForaGym-v1 episodes on a pool of worker processes.
+
+    The transition model is copied once into shared memory, which every
+    worker maps without copying. Each `collect` call splits the episodes in
+    chunks of `chunk_size`, seeded independently of the number of workers,
+    and workers write the return and length of their episodes into a shared
+    output block instead of sending them back.
+
+    With `num_workers=0` the episodes are played in the calling process.
+    Keyword arguments go to `ForaGym_with_threat`.
+    """
+
+    def __init__(self, num_workers=None, items_path="", **kwargs):
+        env = ForaGym_with_threat(render_mode=None, items_path=items_path, **kwargs)
+
+        self.model = env.model
+        self.num_workers = os.cpu_count() if num_workers is None else num_workers
+
+        arrays = self.model.arrays()
+        arrays["consequence_cdf"] = env.consequence_cdf
+        arrays["environments"] = get_environments(env.forest_params)
+        config = {"initial_life_points": tuple(env.initial_life_points)}
+
+        self._shm, spec = _share(arrays)
+        if self.num_workers:
+            self._pool = multiprocessing.get_context().Pool(
+                self.num_workers, initializer=_init_worker, initargs=(spec, config)
+            )
+        else:
+            self._pool = None
+            _init_worker(spec, config)
+
+    def collect(self, policy, num_episodes, seed=None, chunk_size=4096):
+        """Play `num_episodes` episodes under `policy`.
+
+        `policy` is a policy table accepted by `planning.get_action_probs`,
+        or a picklable callable mapping batched observations (days_left,
+        life_points_left and environment arrays, as in `ForaGymThreatVector`)
+        to an action array. Returns the return and length of every episode.
+        """
+        arrays = {
+            "returns": np.zeros(num_episodes),
+            "lengths": np.zeros(num_episodes, dtype=np.int32),
+        }
+        if not callable(policy):
+            probs = get_action_probs(self.model, policy)
+            arrays["cum_probs"] = np.cumsum(probs, axis=1)
+            policy = None
+
+        starts = range(0, num_episodes, chunk_size)
+        seeds = np.random.SeedSequence(seed).spawn(len(starts))
+        shm, spec = _share(arrays)
+
+        try:
+            tasks = [
+                (spec, start, min(start + chunk_size, num_episodes), task_seed, policy)
+                for start, task_seed in zip(starts, seeds)
+            ]
+            if self._pool is None:
+                for task in tasks:
+                    _run_task(*task)
+            else:
+                self._pool.starmap(_run_task, tasks)
+
+            output = _get_views(shm, spec)
+            returns = output["returns"].copy()
+            lengths = output["lengths"].copy()
+            del output
+        finally:
+            shm.close()
+            shm.unlink()
+
+        return returns, lengths
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        elif _worker:
+            # release the views of the in-process worker before unmapping
+            shm = _worker["shm"]
+            _worker.clear()
+            shm.close()
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,170 @@
+import numpy as np
+
+
+def solve(env, atol=1e-12):
+    """Optimal finite-horizon values and policy of a ForaGym environment.
+
+    Runs backward induction over the sparse transition entries of
+    `env.model`, one contraction per day left, for all forests (or fields) at
+    once.
+
+    Returns `V`, `Q` and `policy`, shaped like the state encoding, e.g.
+    [days, life_points, forest] for ForaGym-v1, with a trailing action axis
+    for `Q` and a trailing (wait, forage, indifference) axis for the one-hot
+    `policy`. States without transitions keep `V` = -1 if no life points are
+    left, 0 otherwise, and an all-zero policy row.
+    """
+    model = env.unwrapped.model
+    num_days = model.state_shape[0]
+    day_size = model.nS // num_days
+
+    V = _get_terminal_values(model)
+    Q = np.zeros((model.nS, model.nA))
+
+    for days_left in range(1, num_days):
+        day = slice(days_left * day_size, (days_left + 1) * day_size)
+        Q[day] = _get_q_values(model, V, day.start, day.stop)
+        V[day] = np.where(model.active[day], Q[day].max(axis=1), V[day])
+
+    policy = _get_policy(model, Q, atol)
+
+    return (
+        V.reshape(model.state_shape),
+        Q.reshape(model.state_shape + (model.nA,)),
+        policy.reshape(model.state_shape + (model.nA + 1,)),
+    )
+
+
+def _get_terminal_values(model):
+    _, life_points = np.unravel_index(np.arange(model.nS), model.state_shape)[:2]
+
+    return np.where(life_points == 0, -1.0, 0.0)
+
+
+def _get_entry_rows(model):
+    """Row (state * nA + action) of every transition entry."""
+    rows = np.repeat(np.arange(model.nS * model.nA), np.diff(model.indptr))
+    rows.setflags(write=False)
+
+    return rows
+
+
+def _get_q_values(model, V, start, stop):
+    """Q-values of the states `start:stop`, given the values `V` of the rest."""
+    first_row, last_row = start * model.nA, stop * model.nA
+    entries = slice(model.indptr[first_row], model.indptr[last_row])
+    rows = model.derived("entry_rows", _get_entry_rows)[entries] - first_row
+
+    next_values = np.where(model.done[entries], 0.0, V[model.next_state[entries]])
+    Q = np.bincount(
+        rows,
+        weights=model.prob[entries] * (model.reward[entries] + next_values),
+        minlength=last_row - first_row,
+    )
+
+    return Q.reshape(stop - start, model.nA)
+
+
+def _get_policy(model, Q, atol):
+    is_indifferent = np.isclose(Q[:, 0], Q[:, 1], rtol=0, atol=atol)
+    best_action = np.where(is_indifferent, model.nA, Q.argmax(axis=1))
+
+    policy = np.zeros((model.nS, model.nA + 1))
+    policy[np.arange(model.nS), best_action] = 1.0
+    policy[~model.active] = 0.0
+
+    return policy
+
+
+def get_action_probs(model, policy):
+    """Probability of each action per state, shaped [nS, nA].
+
+    `policy` is a single action for all states, or a table over the states,
+    flat or shaped like the state encoding, holding either one action per
+    state or a trailing axis of action probabilities. A trailing (wait,
+    forage, indifference) axis, as in the `policy` of `solve`, takes either
+    action with equal probability where indifferent. States with an all-zero
+    row get uniform probabilities.
+    """
+    policy = np.asarray(policy)
+    if policy.ndim == 0:
+        policy = np.full(model.nS, policy)
+    if policy.size == model.nS:
+        return np.eye(model.nA)[policy.reshape(model.nS).astype(np.int64)]
+
+    policy = policy.reshape(model.nS, -1).astype(np.float64)
+    if policy.shape[1] == model.nA + 1:
+        policy = policy[:, : model.nA] + policy[:, model.nA :] / model.nA
+
+    total = policy.sum(axis=1, keepdims=True)
+
+    return np.divide(
+        policy, total, out=np.full_like(policy, 1 / model.nA), where=total > 0
+    )
+
+
+def evaluate(env, policy, initial_distribution=None):
+    """Exact expected return, survival probability and occupancy of a policy.
+
+    The state distribution is pushed forward one day at a time through the
+    sparse transition entries of `env.model`, starting from
+    `initial_distribution` (by default that of `env.reset`). `policy` is any
+    table accepted by `get_action_probs`, e.g. the one-hot (wait, forage,
+    indifference) `policy` of `solve`.
+
+    Returns the expected return, the probability of ending an episode with
+    life points left, and the probability of visiting each state, shaped like
+    the state encoding; summed over the other factors, `occupancy[days_left]`
+    is the state distribution on that day.
+
+    Results are exact for the MDP of `env.model`, which for ForaGym-v1 is the
+    one `step` samples. ForaGym-v0's `P` moves to a uniform field count,
+    while `step` draws a uniform nonzero field mask each day, so for v0 this
+    evaluates `P` and does not replace Monte Carlo rollouts of `step`.
+    """
+    model = env.unwrapped.model
+    num_days = model.state_shape[0]
+    day_size = model.nS // num_days
+
+    if initial_distribution is None:
+        initial_distribution = env.unwrapped.get_initial_distribution()
+    occupancy = np.array(initial_distribution, dtype=np.float64).reshape(model.nS)
+    action_probs = get_action_probs(model, policy).ravel()
+    entry_rows = model.derived("entry_rows", _get_entry_rows)
+
+    expected_return = 0.0
+    for days_left in range(num_days - 1, 0, -1):
+        start, stop = days_left * day_size, (days_left + 1) * day_size
+        entries = slice(model.indptr[start * model.nA], model.indptr[stop * model.nA])
+        rows = entry_rows[entries]
+
+        weights = occupancy[rows // model.nA] * action_probs[rows] * model.prob[entries]
+        expected_return += weights @ model.reward[entries]
+
+        # every transition leads to the previous day
+        occupancy[start - day_size : start] += np.bincount(
+            model.next_state[entries] - (start - day_size),
+            weights=weights,
+            minlength=day_size,
+        )
+
+    _, life_points = np.unravel_index(np.arange(model.nS), model.state_shape)[:2]
+    survival_prob = 1.0 - occupancy[life_points == 0].sum()
+
+    return expected_return, survival_prob, occupancy.reshape(model.state_shape)
+
+
+def stack_forest_policies(env, policies):
+    """ForaGym-v1 policy table from one table per forest type.
+
+    `policies[forest_type]` is indexed by `days_left * num_life_points +
+    life_points_left`, as the `optimal_policy` tables of the example
+    notebook; extra rows are ignored.
+    """
+    env = env.unwrapped
+    num_internal_states = env.num_days * env.num_life_points
+
+    policies = np.asarray(policies)[:, :num_internal_states]
+    policies = policies.reshape(env.num_forests, env.num_days, env.num_life_points, -1)
+
+    return np.moveaxis(policies, 0, 2)
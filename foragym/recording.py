@@ -0,0 +1,265 @@
+import json
+import os
+import numpy as np
+
+from gymnasium import Wrapper
+
+from foragym.vector import ForaGymThreatVector
+
+# dtype and per-transition shape of every recorded column
+COLUMNS = {
+    "days_left": (np.int32, ()),
+    "life_points_left": (np.int32, ()),
+    "environment": (np.float32, (3,)),
+    "action": (np.int8, ()),
+    "reward": (np.float32, ()),
+    "done": (np.bool_, ()),
+    "consequence_id": (np.int8, ()),
+    "env_choice": (np.int8, ()),
+    "forest_type": (np.int32, ()),
+}
+
+MANIFEST = "manifest.json"
+
+
+class TrajectoryWriter:
+    """Streams transitions into fixed-size columnar chunks on disk.
+
+    Each column is buffered in a preallocated array of `chunk_size` rows;
+    full chunks are saved as one `.npy` file per column under
+    `path/chunk-XXXXXX/` and listed in `path/manifest.json`, so memory use is
+    bounded by one chunk whatever the number of transitions.
+    """
+
+    def __init__(self, path, chunk_size=1_000_000):
+        self.path = path
+        self.chunk_size = chunk_size
+
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, MANIFEST)):
+            raise FileExistsError(f"{path} already holds a trajectory dataset")
+
+        self.buffers = {
+            name: np.empty((chunk_size,) + shape, dtype=dtype)
+            for name, (dtype, shape) in COLUMNS.items()
+        }
+        self.size = 0
+        self.chunks = []
+
+    def append(self, **columns):
+        """Add one transition (scalars) or a batch of them (arrays)."""
+        if not np.ndim(columns["action"]):
+            for name, value in columns.items():
+                self.buffers[name][self.size] = value
+            self.size += 1
+            if self.size == self.chunk_size:
+                self.flush()
+            return
+
+        num_rows = len(columns["action"])
+        start = 0
+        while start < num_rows:
+            stop = min(num_rows, start + self.chunk_size - self.size)
+            for name, value in columns.items():
+                self.buffers[name][self.size : self.size + stop - start] = value[start:stop]
+            self.size += stop - start
+            start = stop
+            if self.size == self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        if not self.size:
+            return
+
+        name = f"chunk-{len(self.chunks):06d}"
+        os.makedirs(os.path.join(self.path, name))
+        for column, buffer in self.buffers.items():
+            np.save(os.path.join(self.path, name, f"{column}.npy"), buffer[: self.size])
+
+        self.chunks.append({"name": name, "length": self.size})
+        self.size = 0
+        self._write_manifest()
+
+    def close(self):
+        self.flush()
+        self._write_manifest()
+
+    def _write_manifest(self):
+        manifest = {
+            "columns": {
+                name: [np.dtype(dtype).str, list(shape)]
+                for name, (dtype, shape) in COLUMNS.items()
+            },
+            "chunks": self.chunks,
+        }
+        tmp_path = os.path.join(self.path, f"{MANIFEST}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TrajectoryDataset:
+    """Read-only access to a dataset written by `TrajectoryWriter`.
+
+    Chunks are opened memory-mapped, so only the batches being read are
+    paged in.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+        self.columns = list(manifest["columns"])
+        self.chunks = manifest["chunks"]
+
+    def __len__(self):
+        return sum(chunk["length"] for chunk in self.chunks)
+
+    def load_chunk(self, index, columns=None):
+        name = self.chunks[index]["name"]
+        return {
+            column: np.load(os.path.join(self.path, name, f"{column}.npy"), mmap_mode="r")
+            for column in columns or self.columns
+        }
+
+    def batches(self, batch_size, columns=None):
+        """Yield dicts of `batch_size` rows per column, in recording order.
+
+        The last batch holds the remaining rows.
+        """
+        pending = []
+        num_pending = 0
+
+        for index in range(len(self.chunks)):
+            chunk = self.load_chunk(index, columns)
+            length = self.chunks[index]["length"]
+            start = 0
+
+            while start < length:
+                stop = min(length, start + batch_size - num_pending)
+                pending.append({name: array[start:stop] for name, array in chunk.items()})
+                num_pending += stop - start
+                start = stop
+
+                if num_pending == batch_size:
+                    yield _concatenate(pending)
+                    pending = []
+                    num_pending = 0
+
+        if pending:
+            yield _concatenate(pending)
+
+
+def _concatenate(parts):
+    if len(parts) == 1:
+        return {name: np.array(array) for name, array in parts[0].items()}
+
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+class TrajectoryRecorder(Wrapper):
+    """Records every transition of a `ForaGym_with_threat` env to a writer.
+
+    Observation fields, env_choice and forest_type are those the action was
+    taken in.
+    """
+
+    def __init__(self, env, writer):
+        super().__init__(env)
+        self.writer = writer
+        self._obs = None
+
+    def reset(self, **kwargs):
+        self._obs, info = self.env.reset(**kwargs)
+        return self._obs, info
+
+    def step(self, action):
+        env = self.env.unwrapped
+        obs = self._obs
+        env_choice = env.env_choice
+        forest_type = env.forest_type
+
+        self._obs, reward, terminated, truncated, info = self.env.step(action)
+
+        self.writer.append(
+            days_left=obs["days_left"],
+            life_points_left=obs["life_points_left"],
+            environment=obs["environment"],
+            action=action,
+            reward=reward,
+            done=terminated,
+            consequence_id=env.consequence_id,
+            env_choice=env_choice,
+            forest_type=forest_type,
+        )
+
+        return self._obs, reward, terminated, truncated, info
+
+
+class VectorTrajectoryRecorder:
+    """Records every transition of a `ForaGymThreatVector` to a writer."""
+
+    def __init__(self, envs, writer):
+        self.envs = envs
+        self.writer = writer
+
+    def __getattr__(self, name):
+        return getattr(self.envs, name)
+
+    def reset(self, **kwargs):
+        return self.envs.reset(**kwargs)
+
+    def step(self, actions):
+        envs = self.envs
+        days_left = envs.days_left.copy()
+        life_points_left = envs.life_points_left.copy()
+        forest_type = envs.forest_type.copy()
+        env_choice = envs.env_choice.copy()
+
+        obs, rewards, terminations, truncations, infos = envs.step(actions)
+
+        self.writer.append(
+            days_left=days_left,
+            life_points_left=life_points_left,
+            environment=envs.environments[forest_type, env_choice],
+            action=np.asarray(actions),
+            reward=rewards,
+            done=terminations,
+            consequence_id=infos["consequence_id"],
+            env_choice=env_choice,
+            forest_type=forest_type,
+        )
+
+        return obs, rewards, terminations, truncations, infos
+
+
+def record_rollouts(
+    path, policy, num_steps, num_envs=1024, chunk_size=1_000_000, seed=None, **kwargs
+):
+    """Record `num_steps` batched steps of ForaGym-v1 under `policy`.
+
+    `policy` maps the stacked observations to an action array, or is a
+    constant action. Extra keyword arguments go to `ForaGymThreatVector`.
+    Returns the `TrajectoryDataset` written to `path`.
+    """
+    envs = ForaGymThreatVector(num_envs=num_envs, **kwargs)
+
+    with TrajectoryWriter(path, chunk_size=chunk_size) as writer:
+        recorder = VectorTrajectoryRecorder(envs, writer)
+        obs, _ = recorder.reset(seed=seed)
+
+        for _ in range(num_steps):
+            if callable(policy):
+                actions = policy(obs)
+            else:
+                actions = np.full(num_envs, policy)
+            obs, _, _, _, _ = recorder.step(actions)
+
+    return TrajectoryDataset(path)
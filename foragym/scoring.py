@@ -0,0 +1,135 @@
+import os
+import numpy as np
+
+from foragym.planning import solve
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "data.npz")
+
+# `optimal_action` where both actions are optimal, as in the notebooks' policy
+INDIFFERENT = 2
+
+
+def load_trials(path=DATA_PATH):
+    """Trials of a participant data file, as flat arrays.
+
+    The file holds trajectories in the `imitation` layout: `obs` has one more
+    row than `acts` per trajectory (the final observation) and `indices`
+    gives the trajectory boundaries in `acts`. Observations are
+    [days, life_points_left, forest_quality, threat_encounter,
+    nutritional_quality], where days count down to 0 on the last day, i.e.
+    `days_left - 1` of ForaGym-v1. `data_preproc.npz` holds the same trials
+    with normalized features and is rejected, as its days and life points
+    are not integers.
+
+    Returns a dict of `days_left`, `life_points_left`, `environment`,
+    `action` and the `episode` (trajectory) index of every trial.
+    """
+    data = np.load(path)
+    actions = data["acts"].astype(np.int64)
+
+    lengths = np.diff(np.concatenate([[0], data["indices"], [len(actions)]]))
+    episode = np.repeat(np.arange(len(lengths)), lengths)
+
+    # skip the final observation of every earlier trajectory
+    obs = data["obs"][np.arange(len(actions)) + episode, 0]
+    if np.any(obs[:, :2] != np.round(obs[:, :2])):
+        raise ValueError(
+            f"{path} has non-integer days or life points, e.g. normalized features"
+        )
+
+    return {
+        "days_left": obs[:, 0].astype(np.int64) + 1,
+        "life_points_left": obs[:, 1].astype(np.int64),
+        "environment": obs[:, 2:],
+        "action": actions,
+        "episode": episode,
+    }
+
+
+def match_forest_types(env, environment, episode, atol=1e-6):
+    """Forest type of every trial, -1 where no forest matches.
+
+    Observations only show the side in use, so the forest type of an episode
+    is the first one whose left or right side matches every environment seen
+    in it. Trials of an episode must be contiguous.
+    """
+    sides = env.unwrapped.forest_params.reshape(-1, 3)
+    num_words = -(-env.unwrapped.num_forests // 64)
+
+    # code every environment by the indices of its values among those of sides
+    side_code = np.zeros(len(sides), dtype=np.int64)
+    trial_code = np.zeros(len(environment), dtype=np.int64)
+    is_found = np.ones(len(environment), dtype=bool)
+    for column in range(sides.shape[1]):
+        values = np.unique(sides[:, column])
+        index = np.searchsorted(values, environment[:, column] - atol)
+        index = np.minimum(index, len(values) - 1)
+        is_found &= np.abs(values[index] - environment[:, column]) <= atol
+
+        side_code = side_code * len(values) + np.searchsorted(values, sides[:, column])
+        trial_code = trial_code * len(values) + index
+
+    # bit set of the forests having each distinct side
+    codes, side_index = np.unique(side_code, return_inverse=True)
+    forest = np.arange(len(sides)) // 2
+    forest_bits = np.zeros((len(codes), num_words), dtype=np.uint64)
+    np.bitwise_or.at(
+        forest_bits,
+        (side_index, forest // 64),
+        np.left_shift(np.uint64(1), (forest % 64).astype(np.uint64)),
+    )
+
+    index = np.minimum(np.searchsorted(codes, trial_code), len(codes) - 1)
+    is_found &= codes[index] == trial_code
+    trial_bits = np.where(is_found[:, None], forest_bits[index], np.uint64(0))
+
+    starts = np.flatnonzero(np.diff(episode, prepend=-1))
+    episode_bits = np.bitwise_and.reduceat(trial_bits, starts, axis=0)
+
+    # lowest set bit of the first nonzero word
+    word = (episode_bits != 0).argmax(axis=1)
+    bits = episode_bits[np.arange(len(starts)), word]
+    lowest_bit = np.where(bits != 0, bits & (~bits + np.uint64(1)), np.uint64(1))
+    forest_type = word * 64 + np.log2(lowest_bit.astype(np.float64)).astype(np.int64)
+    forest_type[bits == 0] = -1
+
+    return np.repeat(forest_type, np.diff(starts, append=len(episode)))
+
+
+def score_trials(env, trials, Q=None, policy=None):
+    """Compare the choices of `trials` with the optimal policy of `env`.
+
+    `trials` is shaped like the output of `load_trials`; `Q` and `policy`
+    are those of `planning.solve`, computed if not given. Returns a dict of
+    the `forest_type`, the `optimal_action` (`INDIFFERENT` where both are
+    optimal), the Q-value difference `q_diff` between forage and wait, and
+    whether the choice `agrees` with the optimal policy, for every trial.
+    Trials without a matching forest get -1, NaN and False.
+    """
+    if Q is None or policy is None:
+        _, Q, policy = solve(env)
+
+    model = env.unwrapped.model
+    Q = np.reshape(Q, (model.nS, model.nA))
+    policy = np.reshape(policy, (model.nS, model.nA + 1))
+
+    forest_type = match_forest_types(env, trials["environment"], trials["episode"])
+    is_known = forest_type >= 0
+
+    enc_state = env.unwrapped.encode(
+        trials["days_left"], trials["life_points_left"], forest_type
+    )
+    enc_state = np.where(is_known, enc_state, 0)
+
+    optimal_action = np.where(is_known, policy[enc_state].argmax(axis=1), -1)
+    q_diff = np.where(is_known, Q[enc_state, 1] - Q[enc_state, 0], np.nan)
+    agrees = is_known & (
+        (optimal_action == trials["action"]) | (optimal_action == INDIFFERENT)
+    )
+
+    return {
+        "forest_type": forest_type,
+        "optimal_action": optimal_action,
+        "q_diff": q_diff,
+        "agrees": agrees,
+    }
@@ -0,0 +1,294 @@
+import argparse
+import asyncio
+import socket
+import struct
+import numpy as np
+
+from foragym.envs.foragym_simple import ForaGym
+from foragym.vector import ForaGymThreatVector
+
+# request kinds
+OPEN, RESET, STEP, CLOSE = range(4)
+
+# reply statuses; error replies carry a UTF-8 message
+OK, ERROR = range(2)
+
+# env ids of OPEN requests
+SIMPLE, THREAT = range(2)
+
+# every message: payload length, request kind or reply status, then the payload
+HEADER = struct.Struct("<IB")
+# OPEN request: env id, number of envs; reply: number of envs, obs size, actions
+OPEN_REQUEST = struct.Struct("<BI")
+OPEN_REPLY = struct.Struct("<IIB")
+# RESET request: seed, negative for none
+RESET_REQUEST = struct.Struct("<q")
+
+
+class _SimpleBatch:
+    """`num_envs` ForaGym-v0 envs, stepped one after the other."""
+
+    def __init__(self, num_envs, **kwargs):
+        self.envs = [
+            ForaGym(flat_obs=True, info_level="none", **kwargs) for _ in range(num_envs)
+        ]
+        self.num_envs = num_envs
+        self.num_actions = self.envs[0].NUM_ACTIONS
+        self.obs = np.zeros((num_envs, self.envs[0].NUM_FIELDS + 3), dtype=np.float32)
+
+    def reset(self, seed=None):
+        for index, env in enumerate(self.envs):
+            self.obs[index] = env.reset(seed=None if seed is None else seed + index)
+
+        return self.obs
+
+    def step(self, actions):
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        dones = np.zeros(self.num_envs, dtype=bool)
+
+        for index, (env, action) in enumerate(zip(self.envs, actions.tolist())):
+            obs, rewards[index], dones[index], _ = env.step(action)
+            self.obs[index] = env.reset() if dones[index] else obs
+
+        return self.obs, rewards, dones
+
+    def close(self):
+        for env in self.envs:
+            env.close()
+
+
+class _ThreatBatch:
+    """`num_envs` ForaGym-v1 episodes, stepped together by `ForaGymThreatVector`."""
+
+    def __init__(self, num_envs, **kwargs):
+        self.envs = ForaGymThreatVector(num_envs=num_envs, **kwargs)
+        self.num_envs = num_envs
+        self.num_actions = int(self.envs.single_action_space.n)
+        self.obs = np.zeros((num_envs, 5), dtype=np.float32)
+
+    def _pack(self, obs):
+        self.obs[:, 0] = obs["days_left"]
+        self.obs[:, 1] = obs["life_points_left"]
+        self.obs[:, 2:] = obs["environment"]
+
+        return self.obs
+
+    def reset(self, seed=None):
+        obs, _ = self.envs.reset(seed=seed)
+        return self._pack(obs)
+
+    def step(self, actions):
+        obs, rewards, terminations, _, _ = self.envs.step(actions.astype(np.int64))
+        return self._pack(obs), rewards, terminations
+
+    def close(self):
+        self.envs.close()
+
+
+class EnvServer:
+    """Hosts batches of ForaGym envs for out-of-process clients.
+
+    Every connection opens one batch and then sends reset and step requests
+    for all of its envs at once; connections are served concurrently by one
+    asyncio loop. Messages are a `HEADER` (little-endian payload length and
+    request kind or reply status) followed by the payload:
+
+    - OPEN: `OPEN_REQUEST` (SIMPLE or THREAT, num_envs), replied with
+      `OPEN_REPLY` (num_envs, obs_size, num_actions). Opening again replaces
+      the batch.
+    - RESET: `RESET_REQUEST` (seed), replied with the float32 observations.
+    - STEP: one uint8 action per env, replied with the float32 observations,
+      float32 rewards and uint8 dones. Finished episodes are reset, so their
+      row holds the first observation of the next episode.
+    - CLOSE: empty, replied with an empty payload before disconnecting.
+
+    Observations are packed row-major as [num_envs, obs_size]: the flat
+    observations of ForaGym-v0 and [days_left, life_points_left, environment]
+    for ForaGym-v1. Keyword arguments in `simple_kwargs` and `threat_kwargs`
+    go to the envs of each batch.
+    """
+
+    def __init__(self, max_envs=65536, simple_kwargs=None, threat_kwargs=None):
+        self.max_envs = max_envs
+        self.env_kwargs = {SIMPLE: simple_kwargs or {}, THREAT: threat_kwargs or {}}
+        self.num_clients = 0
+
+    async def start(self, path=None, host="127.0.0.1", port=0):
+        """Listen on the Unix socket `path`, or on TCP `host:port`."""
+        if path is not None:
+            return await asyncio.start_unix_server(self._serve_client, path=path)
+
+        return await asyncio.start_server(self._serve_client, host=host, port=port)
+
+    async def _serve_client(self, reader, writer):
+        sock = writer.get_extra_info("socket")
+        if sock is not None and sock.family != socket.AF_UNIX:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self.num_clients += 1
+        batch = None
+        try:
+            while True:
+                try:
+                    length, kind = HEADER.unpack(await reader.readexactly(HEADER.size))
+                    payload = await reader.readexactly(length)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                try:
+                    if kind == OPEN:
+                        if batch is not None:
+                            batch.close()
+                            batch = None
+                        batch = self._open(payload)
+                        reply = OPEN_REPLY.pack(
+                            batch.num_envs, batch.obs.shape[1], batch.num_actions
+                        )
+                    elif kind == CLOSE:
+                        writer.write(HEADER.pack(0, OK))
+                        await writer.drain()
+                        break
+                    elif batch is None:
+                        raise ValueError("no env batch, send OPEN first")
+                    elif kind == RESET:
+                        (seed,) = RESET_REQUEST.unpack(payload)
+                        reply = batch.reset(None if seed < 0 else seed).tobytes()
+                    elif kind == STEP:
+                        obs, rewards, dones = batch.step(self._get_actions(batch, payload))
+                        reply = b"".join(
+                            [
+                                obs.tobytes(),
+                                rewards.astype(np.float32).tobytes(),
+                                dones.astype(np.uint8).tobytes(),
+                            ]
+                        )
+                    else:
+                        raise ValueError(f"unknown request kind {kind}")
+                except (ValueError, struct.error) as error:
+                    message = str(error).encode()
+                    writer.write(HEADER.pack(len(message), ERROR) + message)
+                else:
+                    writer.writelines([HEADER.pack(len(reply), OK), reply])
+                await writer.drain()
+        finally:
+            self.num_clients -= 1
+            if batch is not None:
+                batch.close()
+            writer.close()
+
+    def _open(self, payload):
+        env_id, num_envs = OPEN_REQUEST.unpack(payload)
+        if env_id not in self.env_kwargs:
+            raise ValueError(f"unknown env id {env_id}")
+        if not 0 < num_envs <= self.max_envs:
+            raise ValueError(f"num_envs must be in 1..{self.max_envs}, got {num_envs}")
+
+        batch_class = _SimpleBatch if env_id == SIMPLE else _ThreatBatch
+        return batch_class(num_envs, **self.env_kwargs[env_id])
+
+    def _get_actions(self, batch, payload):
+        actions = np.frombuffer(payload, dtype=np.uint8)
+        if len(actions) != batch.num_envs:
+            raise ValueError(f"expected {batch.num_envs} actions, got {len(actions)}")
+        if actions.max() >= batch.num_actions:
+            raise ValueError(f"actions must be below {batch.num_actions}")
+
+        return actions
+
+
+class EnvClient:
+    """Blocking client of an `EnvServer`, e.g. for tests or actor processes.
+
+    `address` is a Unix socket path, or a (host, port) tuple.
+    """
+
+    def __init__(self, address):
+        if isinstance(address, str):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.connect(address)
+
+        self.num_envs = 0
+        self.obs_size = 0
+        self.num_actions = 0
+
+    def _request(self, kind, payload=b""):
+        self.sock.sendall(HEADER.pack(len(payload), kind) + payload)
+
+        length, status = HEADER.unpack(self._receive(HEADER.size))
+        reply = self._receive(length)
+        if status == ERROR:
+            raise ValueError(reply.decode())
+
+        return reply
+
+    def _receive(self, size):
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        while view:
+            received = self.sock.recv_into(view)
+            if not received:
+                raise ConnectionError("server closed the connection")
+            view = view[received:]
+
+        return buffer
+
+    def open(self, env_id, num_envs):
+        reply = self._request(OPEN, OPEN_REQUEST.pack(env_id, num_envs))
+        self.num_envs, self.obs_size, self.num_actions = OPEN_REPLY.unpack(reply)
+
+    def reset(self, seed=None):
+        reply = self._request(RESET, RESET_REQUEST.pack(-1 if seed is None else seed))
+        return np.frombuffer(reply, dtype=np.float32).reshape(self.num_envs, -1)
+
+    def step(self, actions):
+        reply = self._request(STEP, np.asarray(actions, dtype=np.uint8).tobytes())
+
+        num_obs = self.num_envs * self.obs_size
+        obs = np.frombuffer(reply, dtype=np.float32, count=num_obs)
+        rewards = np.frombuffer(
+            reply, dtype=np.float32, count=self.num_envs, offset=4 * num_obs
+        )
+        dones = np.frombuffer(reply, dtype=np.uint8, offset=4 * (num_obs + self.num_envs))
+
+        return obs.reshape(self.num_envs, -1), rewards, dones.astype(bool)
+
+    def close(self):
+        try:
+            self._request(CLOSE)
+        finally:
+            self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+async def serve(path=None, host="127.0.0.1", port=0, **kwargs):
+    """Run an `EnvServer` until cancelled."""
+    server = await EnvServer(**kwargs).start(path=path, host=host, port=port)
+    async with server:
+        for sock in server.sockets:
+            print(f"serving on {sock.getsockname()}")
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve batches of ForaGym envs.")
+    parser.add_argument("--path", help="Unix socket path, instead of TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5555)
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(path=args.path, host=args.host, port=args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import numpy as np
+
+from foragym.envs.foragym_with_threat import (
+    DEATH_REWARD,
+    FAILURE_PENALTY,
+    THREAT_PENALTY,
+    WAIT_CONSEQUENCE,
+    WAIT_PENALTY,
+)
+from foragym.envs.forests import FOREST_PARAMS
+
+# dynamics constants that can be swept, with their values in ForaGym-v1
+THREAT_PARAMS = {
+    "failure_penalty": FAILURE_PENALTY,
+    "threat_penalty": THREAT_PENALTY,
+    "wait_penalty": WAIT_PENALTY,
+    "nutrition_scale": 1.0,
+    "death_reward": DEATH_REWARD,
+}
+
+# dynamics constants that can be swept, with their values in ForaGym-v0;
+# bad_weather_effect defaults to the env's BAD_WEATHER_EFFECT
+SIMPLE_PARAMS = {
+    "bad_weather_effect": 0.1,
+    "wait_penalty": -1.0,
+    "failure_penalty": -2.0,
+    "success_gain": 1.0,
+    "death_reward": -1.0,
+}
+
+
+def make_grid(**values):
+    """Cartesian product of parameter values, as flat arrays of equal length.
+
+    `make_grid(wait_penalty=[-1, -2], death_reward=[-1, -5, -10])` gives 6
+    variants.
+    """
+    grids = np.meshgrid(
+        *[np.asarray(value, dtype=np.float64) for value in values.values()],
+        indexing="ij",
+    )
+
+    return {name: grid.ravel() for name, grid in zip(values, grids)}
+
+
+def solve_sweep(env, params, num_days=None, max_bytes=2**28):
+    """Optimal Q-values of many variants of the dynamics of `env` at once.
+
+    `params` maps names of `THREAT_PARAMS` (ForaGym-v1) or `SIMPLE_PARAMS`
+    (ForaGym-v0) to arrays with one value per variant; missing constants
+    keep the env's value. All variants are solved together by backward
+    induction over a leading batch axis, in chunks whose temporaries fit in
+    about `max_bytes`.
+
+    Returns Q shaped [num_variants, num_days] + state_shape[1:] + [nA], as
+    the `Q` of `planning.solve`, over `num_days` (by default the env's).
+    Q-values with `days_left` below a horizon do not depend on it, so the
+    variant with horizon `h <= num_days` is `Q[:, :h]`.
+    """
+    env = env.unwrapped
+    is_threat = hasattr(env, "forest_params")
+
+    defaults = dict(THREAT_PARAMS if is_threat else SIMPLE_PARAMS)
+    if not is_threat:
+        defaults["bad_weather_effect"] = env.BAD_WEATHER_EFFECT
+
+    unknown = set(params) - set(defaults)
+    if unknown:
+        raise ValueError(
+            f"unknown parameters {sorted(unknown)}, expected some of {list(defaults)}"
+        )
+
+    num_variants = max([np.size(value) for value in params.values()], default=1)
+    params = {
+        name: np.broadcast_to(
+            np.asarray(params.get(name, value), dtype=np.float64), (num_variants,)
+        )
+        for name, value in defaults.items()
+    }
+
+    if num_days is None:
+        num_days = env.num_days if is_threat else env.NUM_DAYS_LEFT
+    solve_chunk = _solve_threat if is_threat else _solve_simple
+
+    # Q and the per-day temporaries of one variant
+    state_size = np.prod(env.model.state_shape[1:])
+    variant_bytes = state_size * (num_days * env.model.nA + 8 * env.model.K) * 8
+    chunk_size = max(1, int(max_bytes // variant_bytes))
+
+    Q = []
+    for start in range(0, num_variants, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        Q.append(
+            solve_chunk(
+                env, {name: value[chunk] for name, value in params.items()}, num_days
+            )
+        )
+
+    return np.concatenate(Q)
+
+
+def _solve_threat(env, params, num_days):
+    num_variants = len(params["death_reward"])
+    num_life_points = env.num_life_points
+    num_forests = env.num_forests
+
+    transition_prob, _ = env._get_consequences(env.forest_params)
+    nutrition = env.forest_params[
+        :,
+        [
+            FOREST_PARAMS.index("nutritional_quality_left"),
+            FOREST_PARAMS.index("nutritional_quality_right"),
+        ],
+    ]
+
+    # life point change of every consequence, shaped [variants, forests, 7],
+    # in the order of `env._get_consequences`
+    ones = np.ones((num_variants, num_forests))
+    failure = params["failure_penalty"][:, None] * ones
+    threat = params["threat_penalty"][:, None] * ones
+    gain = params["nutrition_scale"][:, None, None] * nutrition
+    life_points_change = np.stack(
+        [
+            failure,
+            failure,
+            gain[:, :, 0],
+            gain[:, :, 1],
+            threat,
+            threat,
+            params["wait_penalty"][:, None] * ones,
+        ],
+        axis=2,
+    )
+
+    life_points = np.arange(num_life_points)[None, :, None, None]
+    new_life_points = np.clip(
+        life_points + life_points_change[:, None], 0, num_life_points - 1
+    ).astype(np.int64)
+    is_dead = new_life_points == 0
+    reward = np.where(is_dead, params["death_reward"][:, None, None, None], 0.0)
+
+    # index of the next state in the flat values of all variants, with dead
+    # ends pointing to a trailing zero
+    state_size = num_life_points * num_forests
+    next_state = (
+        np.arange(num_variants)[:, None, None, None] * state_size
+        + new_life_points * num_forests
+        + np.arange(num_forests)[None, None, :, None]
+    )
+    next_state[is_dead] = num_variants * state_size
+
+    Q = np.zeros((num_variants, num_days, num_life_points, num_forests, env.nA))
+    V = np.zeros(num_variants * state_size + 1)
+    for days_left in range(1, num_days):
+        values = reward + V[next_state]
+
+        wait = values[..., WAIT_CONSEQUENCE]
+        forage = np.einsum(
+            "blfc,fc->blf",
+            values[..., :WAIT_CONSEQUENCE],
+            transition_prob[:, :WAIT_CONSEQUENCE],
+        )
+        wait[:, 0] = forage[:, 0] = 0.0
+
+        Q[:, days_left, :, :, 0] = wait
+        Q[:, days_left, :, :, 1] = forage
+        V[:-1] = np.maximum(wait, forage).ravel()
+
+    return Q
+
+
+def _solve_simple(env, params, num_days):
+    num_variants = len(params["death_reward"])
+    num_life_points = env.NUM_LIFE_POINTS
+    num_fields = env.NUM_FIELDS
+    num_weather_types = env.NUM_WEATHER_TYPES
+
+    field = np.arange(num_fields + 1)[None, :, None]
+    weather = np.arange(num_weather_types)[None, None, :]
+    prob_success = np.clip(
+        field / num_fields - weather * params["bad_weather_effect"][:, None, None], 0, 1
+    )
+    prob_failure = np.clip(1 - prob_success, 0, 1)
+
+    # life point change of wait, forage but fail, forage and found
+    life_points_change = np.stack(
+        [params["wait_penalty"], params["failure_penalty"], params["success_gain"]],
+        axis=1,
+    )
+    life_points = np.arange(num_life_points)[None, :, None]
+    new_life_points = np.clip(
+        life_points + life_points_change[:, None], 0, num_life_points - 1
+    ).astype(np.int64)
+    is_dead = new_life_points == 0
+    reward = np.where(is_dead, params["death_reward"][:, None, None], 0.0)
+
+    Q = np.zeros(
+        (num_variants, num_days, num_life_points, num_fields + 1, num_weather_types, 2)
+    )
+
+    # value of the next day's life points, averaged over its fields and weather
+    next_day_values = np.zeros((num_variants, num_life_points))
+    for days_left in range(1, num_days):
+        next_values = np.take_along_axis(
+            next_day_values, new_life_points.reshape(num_variants, -1), axis=1
+        ).reshape(new_life_points.shape)
+        values = reward + np.where(is_dead, 0.0, next_values)
+
+        wait = values[:, :, 0, None, None]
+        forage = (
+            prob_failure[:, None] * values[:, :, 1, None, None]
+            + prob_success[:, None] * values[:, :, 2, None, None]
+        )
+        next_day_values = np.maximum(wait, forage)[:, :, 1:].mean(axis=(2, 3))
+
+        Q[:, days_left, :, :, :, 0] = wait
+        Q[:, days_left, :, :, :, 1] = forage
+        Q[:, days_left, 0] = 0.0
+        Q[:, days_left, :, 0] = 0.0
+
+    return Q
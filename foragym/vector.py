@@ -0,0 +1,238 @@
+import numpy as np
+
+from gymnasium.utils import seeding
+from gymnasium.vector import VectorEnv
+from gymnasium.vector.utils import batch_space
+
+from foragym.envs.foragym_with_threat import WAIT_CONSEQUENCE, ForaGym_with_threat
+
+try:
+    from gymnasium.vector import AutoresetMode
+except ImportError:  # gymnasium < 1.0
+    AutoresetMode = None
+
+# info key of the last observation of the episodes reset within `step`
+FINAL_OBS = "final_observation" if AutoresetMode is None else "final_obs"
+
+
+def get_environments(forest_params):
+    """Observed environment per forest and side: quality, threat, nutrition.
+
+    Shaped [num_forests, 2, 3] and indexed by env_choice, where 1 is the left
+    side.
+    """
+    return forest_params.reshape(-1, 2, 3)[:, ::-1].astype(np.float32)
+
+
+def draw_episodes(rng, num_episodes, num_days, num_forests, initial_life_points):
+    """Initial days_left, life_points_left, forest_type and env_choice arrays
+    of `num_episodes` ForaGym-v1 episodes."""
+    days_left = np.full(num_episodes, num_days - 1, dtype=np.int64)
+    life_points_left = rng.integers(*initial_life_points, size=num_episodes)
+    forest_type = rng.integers(0, max(num_forests - 1, 1), size=num_episodes)
+    env_choice = rng.integers(0, 2, size=num_episodes)
+
+    return days_left, life_points_left, forest_type, env_choice
+
+
+def step_episodes(
+    model,
+    consequence_cdf,
+    rng,
+    days_left,
+    life_points_left,
+    forest_type,
+    env_choice,
+    actions,
+):
+    """Advance batched ForaGym-v1 episodes by one step of `actions`.
+
+    Draws the forage outcomes from `consequence_cdf`, follows the entries of
+    `model`, and draws the env_choice of the next step for every episode.
+    Returns the next days_left, life_points_left and env_choice, and the
+    reward, done and consequence_id of the step.
+    """
+    _, num_life_points, num_forests = model.state_shape
+    enc_state = (
+        days_left * num_life_points + life_points_left
+    ) * num_forests + forest_type
+
+    chance = rng.random(len(enc_state))
+    state_cdf = consequence_cdf[enc_state, env_choice]
+    outcome = (state_cdf[:, 0] <= chance).astype(np.int64)
+    outcome += state_cdf[:, 1] <= chance
+
+    consequence_id = np.where(
+        actions == 1, outcome * 2 + 1 - env_choice, WAIT_CONSEQUENCE
+    )
+
+    entry = model.entry(enc_state, actions, consequence_id)
+    new_enc_state = model.next_state[entry].astype(np.int64)
+    next_env_choice = rng.integers(0, 2, size=len(enc_state))
+
+    return (
+        new_enc_state // (num_life_points * num_forests),
+        (new_enc_state // num_forests) % num_life_points,
+        next_env_choice,
+        model.reward[entry],
+        model.done[entry],
+        consequence_id,
+    )
+
+
+class ForaGymThreatVector(VectorEnv):
+    """Batched ForaGym-v1: steps `num_envs` episodes of `ForaGym_with_threat` per call.
+
+    Episode variables are held as arrays and all episodes are advanced with a
+    single vectorized draw over a transition table shared by every episode.
+    Finished episodes are reset within the same `step` call (the SAME_STEP
+    autoreset mode of gymnasium 1.x); their last observation and info are
+    reported in `infos[FINAL_OBS]` and `infos["final_info"]`, masked by
+    `infos["_" + FINAL_OBS]` and `infos["_final_info"]`.
+    """
+
+    metadata = {"render_modes": []}
+    if AutoresetMode is not None:
+        metadata["autoreset_mode"] = AutoresetMode.SAME_STEP
+
+    def __init__(self, num_envs=1, items_path="", **kwargs):
+        self.env = ForaGym_with_threat(render_mode=None, items_path=items_path, **kwargs)
+
+        self.num_envs = num_envs
+        self.num_days = self.env.num_days
+        self.num_life_points = self.env.num_life_points
+        self.num_forests = self.env.num_forests
+
+        self.single_observation_space = self.env.observation_space
+        self.single_action_space = self.env.action_space
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+
+        self.closed = False
+        self.np_random, _ = seeding.np_random()
+
+        self._get_transition_table()
+
+        self.days_left = np.zeros(num_envs, dtype=np.int64)
+        self.life_points_left = np.zeros(num_envs, dtype=np.int64)
+        self.forest_type = np.zeros(num_envs, dtype=np.int64)
+        self.env_choice = np.zeros(num_envs, dtype=np.int64)
+
+    def _get_transition_table(self):
+        self.cum_probs = self.env.consequence_cdf
+
+        self.environments = get_environments(self.env.forest_params)
+
+    def _init_episodes(self, mask):
+        (
+            self.days_left[mask],
+            self.life_points_left[mask],
+            self.forest_type[mask],
+            self.env_choice[mask],
+        ) = draw_episodes(
+            self.np_random,
+            int(np.count_nonzero(mask)),
+            self.num_days,
+            self.num_forests,
+            self.env.initial_life_points,
+        )
+
+    def _get_obs(self):
+        return {
+            "days_left": self.days_left.copy(),
+            "life_points_left": self.life_points_left.copy(),
+            "environment": self.environments[self.forest_type, self.env_choice],
+        }
+
+    def _get_info(self):
+        return {
+            "env_choice": self.env_choice.copy(),
+            "forest_type": self.forest_type.copy(),
+        }
+
+    def get_state(self):
+        """Snapshot of all episodes, to be restored with `set_state`.
+
+        Returns an int64 array of [days_left, life_points_left, forest_type,
+        env_choice] per episode and the state of `np_random`.
+        """
+        episodes = np.stack(
+            [self.days_left, self.life_points_left, self.forest_type, self.env_choice],
+            axis=1,
+        )
+
+        return episodes, self.np_random.bit_generator.state
+
+    def set_state(self, state):
+        """Restore `num_envs` episodes at once.
+
+        `state` is a `get_state` snapshot, or episode rows from anywhere with
+        a None RNG state to keep the current one: e.g. the first four entries
+        of `ForaGym_with_threat.get_state()` repeated `num_envs` times, to
+        branch one episode into many.
+        """
+        episodes, rng_state = state
+        episodes = np.asarray(episodes, dtype=np.int64)
+        if episodes.shape != (self.num_envs, 4):
+            raise ValueError(
+                f"expected episodes shaped {(self.num_envs, 4)}, got {episodes.shape}"
+            )
+
+        (
+            self.days_left,
+            self.life_points_left,
+            self.forest_type,
+            self.env_choice,
+        ) = episodes.T.copy()
+
+        if rng_state is not None:
+            self.np_random.bit_generator.state = rng_state
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.np_random, _ = seeding.np_random(seed)
+
+        self._init_episodes(np.ones(self.num_envs, dtype=bool))
+
+        return self._get_obs(), self._get_info()
+
+    def step(self, actions):
+        (
+            self.days_left,
+            self.life_points_left,
+            self.env_choice,
+            rewards,
+            terminations,
+            consequence_id,
+        ) = step_episodes(
+            self.env.model,
+            self.cum_probs,
+            self.np_random,
+            self.days_left,
+            self.life_points_left,
+            self.forest_type,
+            self.env_choice,
+            np.asarray(actions),
+        )
+        rewards = rewards.astype(np.float32)
+        truncations = np.zeros(self.num_envs, dtype=bool)
+
+        infos = self._get_info()
+        infos["consequence_id"] = consequence_id
+
+        if terminations.any():
+            final_obs = self._get_obs()
+            final_info = infos
+            self._init_episodes(terminations)
+
+            infos = self._get_info()
+            infos["consequence_id"] = consequence_id
+            infos[FINAL_OBS] = final_obs
+            infos["_" + FINAL_OBS] = terminations
+            infos["final_info"] = final_info
+            infos["_final_info"] = terminations
+
+        return self._get_obs(), rewards, terminations, truncations, infos
+
+    def close_extras(self, **kwargs):
+        self.env.close()
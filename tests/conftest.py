@@ -0,0 +1,16 @@
+import warnings
+
+import pytest
+
+from foragym.envs import transition_model
+
+# ForaGym-v0 still imports the legacy gym package
+warnings.filterwarnings("ignore", module="gym")
+
+
+@pytest.fixture(autouse=True)
+def fresh_models():
+    """Build every model from scratch instead of reusing another test's."""
+    transition_model._shared_models.clear()
+    yield
+    transition_model._shared_models.clear()
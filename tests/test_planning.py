@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from foragym.envs import ForaGym, ForaGym_with_threat
+from foragym.planning import evaluate, solve
+from foragym.vector import FINAL_OBS, ForaGymThreatVector
+
+
+def backward_induction(env):
+    """Values and Q-values of `env.P`, one state at a time from the last day."""
+    model = env.model
+    V = np.zeros(model.nS)
+    Q = np.zeros((model.nS, model.nA))
+
+    # states with fewer days left come first in the encoding
+    for state in range(model.nS):
+        if not env.P[state][0]:
+            life_points = np.unravel_index(state, model.state_shape)[1]
+            V[state] = -1.0 if life_points == 0 else 0.0
+            continue
+        for action in range(model.nA):
+            Q[state, action] = sum(
+                prob * (reward + (0.0 if done else V[next_state]))
+                for prob, next_state, reward, done in env.P[state][action]
+            )
+        V[state] = Q[state].max()
+
+    return V.reshape(model.state_shape), Q.reshape(model.state_shape + (model.nA,))
+
+
+@pytest.mark.parametrize(
+    "make_env",
+    [
+        lambda: ForaGym_with_threat(cache=False),
+        lambda: ForaGym_with_threat(
+            num_days=5, num_life_points=5, initial_life_points=(2, 4), cache=False
+        ),
+        lambda: ForaGym(),
+    ],
+)
+def test_solve_matches_backward_induction(make_env):
+    env = make_env()
+    V, Q, policy = solve(env)
+    expected_V, expected_Q = backward_induction(env)
+
+    np.testing.assert_allclose(V, expected_V, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(Q, expected_Q, rtol=0, atol=1e-12)
+    assert np.array_equal(policy.sum(axis=-1), env.model.active.reshape(V.shape))
+
+
+def test_evaluate_matches_monte_carlo():
+    num_episodes = 20000
+    envs = ForaGymThreatVector(num_envs=num_episodes, cache=False)
+    _, Q, _ = solve(envs.env)
+    actions = Q.argmax(axis=-1)
+
+    expected_return, survival_prob, _ = evaluate(envs.env, actions)
+
+    # play the first episode of every env
+    envs.reset(seed=0)
+    returns = np.zeros(num_episodes)
+    survived = np.zeros(num_episodes, dtype=bool)
+    running = np.ones(num_episodes, dtype=bool)
+    while running.any():
+        _, rewards, terminations, _, infos = envs.step(
+            actions[envs.days_left, envs.life_points_left, envs.forest_type]
+        )
+        returns += np.where(running, rewards, 0.0)
+        if terminations.any():
+            is_last = running & terminations
+            survived[is_last] = infos[FINAL_OBS]["life_points_left"][is_last] > 0
+            running &= ~terminations
+
+    tolerance = 5 * returns.std() / np.sqrt(num_episodes)
+    assert returns.mean() == pytest.approx(expected_return, abs=tolerance)
+
+    tolerance = 5 * np.sqrt(survival_prob * (1 - survival_prob) / num_episodes)
+    assert survived.mean() == pytest.approx(survival_prob, abs=tolerance)
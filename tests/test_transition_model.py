@@ -0,0 +1,122 @@
+from itertools import product
+
+import numpy as np
+import pytest
+
+from foragym.envs import ForaGym, ForaGym_with_threat
+
+
+def get_threat_reference(env):
+    """`P` of ForaGym-v1 built state by state, as before the transition model."""
+    P = {state: {action: [] for action in range(env.nA)} for state in range(env.nS)}
+
+    for days_left, life_points_left, forest_type in product(
+        range(1, env.num_days),
+        range(1, env.num_life_points),
+        range(env.num_forests),
+    ):
+        (
+            quality_left,
+            threat_left,
+            nutrition_left,
+            quality_right,
+            threat_right,
+            nutrition_right,
+        ) = env.forest_params[forest_type]
+        consequences = [
+            (1, (1 - quality_left) * (1 - threat_left), -2),
+            (1, (1 - quality_right) * (1 - threat_right), -2),
+            (1, quality_left * (1 - threat_left), nutrition_left),
+            (1, quality_right * (1 - threat_right), nutrition_right),
+            (1, threat_left, -3),
+            (1, threat_right, -3),
+            (0, 2, -1),
+        ]
+
+        enc_state = env.encode(days_left, life_points_left, forest_type)
+        for action, prob, life_points_change in consequences:
+            new_days_left = days_left - 1
+            new_life_points_left = int(
+                np.clip(
+                    life_points_left + life_points_change, 0, env.num_life_points - 1
+                )
+            )
+            P[enc_state][action].append(
+                [
+                    prob / 2,
+                    env.encode(new_days_left, new_life_points_left, forest_type),
+                    -1 if not new_life_points_left else 0,
+                    not new_life_points_left or not new_days_left,
+                ]
+            )
+
+    return P
+
+
+def get_simple_reference(env):
+    """`P` of ForaGym-v0 built state by state, as before the transition model."""
+    P = {
+        state: {action: [] for action in range(env.NUM_ACTIONS)}
+        for state in range(env.NUM_STATES)
+    }
+
+    new_field_states = list(
+        product(range(1, env.NUM_FIELDS + 1), range(env.NUM_WEATHER_TYPES))
+    )
+    for days_left, life_point, field, weather in product(
+        range(1, env.NUM_DAYS_LEFT),
+        range(1, env.NUM_LIFE_POINTS),
+        range(1, env.NUM_FIELDS + 1),
+        range(env.NUM_WEATHER_TYPES),
+    ):
+        prob_success = np.clip(
+            field / env.NUM_FIELDS - weather * env.BAD_WEATHER_EFFECT, 0, 1
+        )
+        # (action, probability, life point change) of wait, forage but fail,
+        # forage and found
+        outcomes = [(0, 1.0, -1), (1, 1 - prob_success, -2), (1, prob_success, 1)]
+
+        enc_state = env.encode(days_left, life_point, field, weather)
+        for action, prob, life_points_change in outcomes:
+            new_life_point = int(
+                np.clip(life_point + life_points_change, 0, env.NUM_LIFE_POINTS - 1)
+            )
+            for field_state in new_field_states:
+                P[enc_state][action].append(
+                    [
+                        prob / len(new_field_states),
+                        env.encode(days_left - 1, new_life_point, *field_state),
+                        -1 if not new_life_point else 0,
+                        not new_life_point or not days_left - 1,
+                    ]
+                )
+
+    return P
+
+
+@pytest.mark.parametrize(
+    "make_env",
+    [
+        lambda: ForaGym_with_threat(cache=False),
+        lambda: ForaGym_with_threat(
+            num_days=4, forests=np.full((3, 6), 0.5), cache=False
+        ),
+        lambda: ForaGym(),
+        lambda: ForaGym(num_days_left=3, num_life_points=4, num_fields=3),
+    ],
+)
+def test_P_matches_reference(make_env):
+    env = make_env()
+    if isinstance(env, ForaGym_with_threat):
+        reference = get_threat_reference(env)
+    else:
+        reference = get_simple_reference(env)
+
+    assert len(env.P) == len(reference)
+    for state, transitions in reference.items():
+        for action, expected in transitions.items():
+            actual = env.P[state][action]
+            assert len(actual) == len(expected), (state, action)
+            for (prob, next_state, reward, done), entry in zip(expected, actual):
+                assert entry[0] == pytest.approx(prob, abs=1e-12)
+                assert tuple(entry[1:]) == (next_state, reward, done), (state, action)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from foragym.envs import ForaGym_with_threat, transition_model
+from foragym.planning import solve
+
+
+def get_forest_tables(forests):
+    edited = forests.copy()
+    edited[5] *= 0.5
+
+    return {
+        "edit": edited,
+        "grow": np.r_[forests, forests[:10] * 0.9],
+        "shrink": forests[:40],
+    }
+
+
+@pytest.mark.parametrize("name", ["edit", "grow", "shrink"])
+def test_update_forests_matches_new_env(name):
+    env = ForaGym_with_threat(cache=False)
+    num_forests = env.num_forests
+    forests = get_forest_tables(env.forest_params)[name]
+
+    changed = env.update_forests(forests)
+    transition_model._shared_models.clear()
+    expected = ForaGym_with_threat(forests=forests, cache=False)
+
+    arrays, expected_arrays = env.model.arrays(), expected.model.arrays()
+    assert arrays.keys() == expected_arrays.keys()
+    for key, array in expected_arrays.items():
+        assert np.array_equal(arrays[key], array), key
+    assert np.array_equal(env.consequence_cdf, expected.consequence_cdf)
+    assert np.array_equal(solve(env)[0], solve(expected)[0])
+
+    if name == "edit":
+        assert list(changed) == [5]
+    elif name == "grow":
+        assert list(changed) == list(range(num_forests, len(forests)))
+    else:
+        assert len(changed) == 0
+
+    env.reset(seed=0)
+    env.step(1)
+    assert env.forest_type < len(forests)
+
+
+def test_update_forests_chain_matches_new_env():
+    env = ForaGym_with_threat(cache=False)
+    for forests in get_forest_tables(env.forest_params).values():
+        env.update_forests(forests)
+
+    transition_model._shared_models.clear()
+    expected = ForaGym_with_threat(forests=forests, cache=False)
+
+    for key, array in expected.model.arrays().items():
+        assert np.array_equal(env.model.arrays()[key], array), key
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from foragym.vector import FINAL_OBS, AutoresetMode, ForaGymThreatVector
+
+gymnasium_vector = pytest.importorskip("gymnasium.wrappers.vector")
+
+
+def test_same_step_autoreset():
+    envs = ForaGymThreatVector(num_envs=64, cache=False)
+    if AutoresetMode is not None:
+        assert envs.metadata["autoreset_mode"] == AutoresetMode.SAME_STEP
+
+    obs, _ = envs.reset(seed=0)
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        days_left = obs["days_left"]
+        obs, _, terminations, _, infos = envs.step(rng.integers(0, 2, size=64))
+
+        # finished episodes are replaced by new ones within the same step
+        assert np.all(obs["days_left"][terminations] == envs.num_days - 1)
+        assert np.all(obs["days_left"][~terminations] == days_left[~terminations] - 1)
+        if terminations.any():
+            final_obs = infos[FINAL_OBS]
+            assert np.array_equal(infos["_" + FINAL_OBS], terminations)
+            assert np.all(
+                (final_obs["days_left"][terminations] == 0)
+                | (final_obs["life_points_left"][terminations] == 0)
+            )
+
+
+def test_record_episode_statistics():
+    envs = gymnasium_vector.RecordEpisodeStatistics(
+        ForaGymThreatVector(num_envs=64, cache=False)
+    )
+
+    envs.reset(seed=0)
+    returns = np.zeros(64)
+    lengths = np.zeros(64, dtype=np.int64)
+    num_episodes = 0
+    for _ in range(50):
+        _, rewards, terminations, _, infos = envs.step(np.ones(64, dtype=np.int64))
+        returns += rewards
+        lengths += 1
+        if terminations.any():
+            episode = infos["episode"]
+            np.testing.assert_allclose(
+                episode["r"][terminations], returns[terminations]
+            )
+            assert np.array_equal(episode["l"][terminations], lengths[terminations])
+            num_episodes += terminations.sum()
+            returns[terminations] = 0.0
+            lengths[terminations] = 0
+
+    assert num_episodes > 64
+
+
+def test_one_forest():
+    forests = ForaGymThreatVector(cache=False).env.forest_params[:1]
+    envs = ForaGymThreatVector(num_envs=8, forests=forests, cache=False)
+
+    envs.reset(seed=0)
+    for _ in range(20):
+        envs.step(np.ones(8, dtype=np.int64))
+    assert np.all(envs.forest_type == 0)